@@ -0,0 +1,252 @@
+"""
+A Runner that never touches the neonize FFI, plus builders for realistic
+``MessageEv`` protobufs.
+"""
+
+import time
+from itertools import count
+from typing import List, Optional
+
+from neonize.client import NewClient
+from neonize.proto import Neonize_pb2 as neonize_proto
+from neonize.proto import def_pb2 as wa_proto
+
+from luna.cache import MemoryCache
+from luna.command import CommandHandler
+from luna.dedup import RecentIds
+from luna.quota import QuotaManager
+from luna.core import Runner
+from luna.events import EventHandler
+from luna.utils import str_to_jid
+
+BOT_JID = "6280000000000@s.whatsapp.net"
+OWNER_JID = "6281111111111@s.whatsapp.net"
+
+
+def user_jid(n: int) -> str:
+    return f"62812{n:08d}@s.whatsapp.net"
+
+
+def group_jid(n: int) -> str:
+    return f"1203630{n:011d}@g.us"
+
+
+class FakeContactStore:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def get_contact(self, user: neonize_proto.JID) -> neonize_proto.ContactInfo:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return neonize_proto.ContactInfo(Found=True, PushName=f"User {user.User[-4:]}")
+
+
+class _FakeClient(NewClient):
+    """Stands in for the FFI calls Runner makes through ``super()``."""
+
+    def send_message(self, to, message, link_preview=False):
+        self.sent.append((to, message))
+        if len(self.sent) > 10000:
+            del self.sent[:5000]
+        if self.send_latency:
+            time.sleep(self.send_latency)
+        return neonize_proto.SendResponse(
+            ID=f"3EB0{next(self._ids):016X}", Timestamp=int(time.time())
+        )
+
+    def get_group_info(self, jid: neonize_proto.JID) -> neonize_proto.GroupInfo:
+        self.group_info_calls += 1
+        if self.ffi_latency:
+            time.sleep(self.ffi_latency)
+        size = self.group_sizes.get(f"{jid.User}@{jid.Server}", 50)
+        return build_group_info(f"{jid.User}@{jid.Server}", size)
+
+    def get_me(self) -> neonize_proto.Device:
+        return neonize_proto.Device(
+            JID=str_to_jid(BOT_JID), PushName="Luna", Platform="bench", Initialized=True
+        )
+
+    def get_blocklist(self) -> neonize_proto.Blocklist:
+        return neonize_proto.Blocklist()
+
+    def download_any(self, message):
+        return b""
+
+    @property
+    def is_connected(self) -> bool:
+        return True
+
+
+class FakeRunner(Runner, _FakeClient):
+    def __init__(
+        self,
+        dir_commands: str = "commands",
+        ffi_latency: float = 0.0,
+        send_latency: float = 0.0,
+        with_event_handler: bool = False,
+        **event_kwargs,
+    ):
+        # Runner.__init__ would start the neonize client and the file watcher
+        self.name = "bench"
+        self.uuid = b"bench"
+        self.bot_name = "bench"
+        self.device_props = None
+        self.owners = [OWNER_JID, BOT_JID]
+        self.chats = {}
+        self.tokovoucher = {}
+        self.group_cache = MemoryCache("group_metadata", 1024, 300)
+        self.contact_cache = MemoryCache("contacts", 4096, 600)
+        self.snapshot = None
+        self.store = None
+        self.memwatch = None
+        self.scheduler = None
+        self.contact = FakeContactStore(ffi_latency)
+        self.ffi_latency = ffi_latency
+        self.send_latency = send_latency
+        self.group_sizes = {}
+        self.group_info_calls = 0
+        self.sent = []
+        self._ids = count()
+        self.command_handler = CommandHandler(
+            dir_commands, watch=False, dedup=RecentIds(), quota=QuotaManager()
+        )
+        self.event = EventHandler(self, **event_kwargs) if with_event_handler else None
+
+
+_message_ids = count()
+
+
+def message_id() -> str:
+    return f"{next(_message_ids):020X}"
+
+
+def build_group_info(jid: str, participants: int) -> neonize_proto.GroupInfo:
+    members = [
+        neonize_proto.GroupParticipant(
+            JID=str_to_jid(user_jid(i)),
+            LID=str_to_jid(f"{10**14 + i}@lid"),
+            IsAdmin=i < 3,
+            IsSuperAdmin=i == 0,
+            DisplayName=f"User {i}",
+        )
+        for i in range(participants)
+    ]
+    members.append(neonize_proto.GroupParticipant(JID=str_to_jid(BOT_JID), IsAdmin=True))
+    return neonize_proto.GroupInfo(
+        JID=str_to_jid(jid),
+        OwnerJID=str_to_jid(user_jid(0)),
+        GroupName=neonize_proto.GroupName(Name=f"Group {jid[:12]}", NameSetAt=1),
+        GroupTopic=neonize_proto.GroupTopic(Topic="Benchmark group " * 8),
+        Participants=members,
+        GroupCreated=1700000000,
+    )
+
+
+def build_event(
+    message: wa_proto.Message,
+    chat: str,
+    sender: Optional[str] = None,
+    msg_id: Optional[str] = None,
+    timestamp: Optional[int] = None,
+) -> neonize_proto.Message:
+    is_group = chat.endswith("@g.us")
+    sender = sender or chat
+    # every proto2 required field is set, so the event serializes like a real one
+    return neonize_proto.Message(
+        Info=neonize_proto.MessageInfo(
+            ID=msg_id or message_id(),
+            ServerID=0,
+            MessageSource=neonize_proto.MessageSource(
+                Chat=str_to_jid(chat),
+                Sender=str_to_jid(sender),
+                IsFromMe=False,
+                IsGroup=is_group,
+                BroadcastListOwner=neonize_proto.JID(
+                    User="", Server="", RawAgent=0, Device=0, Integrator=0, IsEmpty=True
+                ),
+            ),
+            Pushname="Bench",
+            Timestamp=timestamp or int(time.time()),
+            Type="text",
+            Category="",
+            Multicast=False,
+            MediaType="",
+            Edit="",
+        ),
+        Message=message,
+        IsEphemeral=False,
+        IsViewOnce=False,
+        IsViewOnceV2=False,
+        IsEdit=False,
+        UnavailableRequestID="",
+        RetryCount=0,
+    )
+
+
+def text_event(text: str, chat: str, sender: Optional[str] = None, **kwargs):
+    return build_event(wa_proto.Message(conversation=text), chat, sender, **kwargs)
+
+
+def mention_event(text: str, chat: str, sender: str, mentions: List[str], **kwargs):
+    message = wa_proto.Message(
+        extendedTextMessage=wa_proto.ExtendedTextMessage(
+            text=text, contextInfo=wa_proto.ContextInfo(mentionedJid=mentions)
+        )
+    )
+    return build_event(message, chat, sender, **kwargs)
+
+
+def image_event(caption: str, chat: str, sender: Optional[str] = None, **kwargs):
+    message = wa_proto.Message(
+        imageMessage=wa_proto.ImageMessage(
+            caption=caption,
+            mimetype="image/jpeg",
+            fileLength=123456,
+            height=1280,
+            width=720,
+            jpegThumbnail=b"\xff\xd8" + b"\x00" * 2048,
+            mediaKey=b"k" * 32,
+            fileSha256=b"s" * 32,
+            directPath="/v/t62.7118-24/bench",
+        )
+    )
+    return build_event(message, chat, sender, **kwargs)
+
+
+def quoted_event(
+    text: str, chat: str, sender: str, quoted_text: str, quoted_sender: str, **kwargs
+):
+    message = wa_proto.Message(
+        extendedTextMessage=wa_proto.ExtendedTextMessage(
+            text=text,
+            contextInfo=wa_proto.ContextInfo(
+                stanzaId=message_id(),
+                participant=quoted_sender,
+                quotedMessage=wa_proto.Message(conversation=quoted_text),
+            ),
+        )
+    )
+    return build_event(message, chat, sender, **kwargs)
+
+
+def edit_event(original: neonize_proto.Message, new_text: str, **kwargs):
+    source = original.Info.MessageSource
+    message = wa_proto.Message(
+        protocolMessage=wa_proto.ProtocolMessage(
+            key=wa_proto.MessageKey(
+                remoteJid=f"{source.Chat.User}@{source.Chat.Server}",
+                fromMe=False,
+                id=original.Info.ID,
+            ),
+            type=wa_proto.ProtocolMessage.MESSAGE_EDIT,
+            editedMessage=wa_proto.Message(conversation=new_text),
+        )
+    )
+    return build_event(
+        message,
+        f"{source.Chat.User}@{source.Chat.Server}",
+        f"{source.Sender.User}@{source.Sender.Server}",
+        **kwargs,
+    )
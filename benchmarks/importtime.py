@@ -0,0 +1,94 @@
+"""
+Guard the import cost of the luna package with ``python -X importtime``.
+
+Usage::
+
+    python -m benchmarks.importtime [--budget-ms 60] [--stmt "from luna import BaseCommand"]
+
+Fails when a heavy dependency gets imported by the statement or when the
+cumulative import time of ``luna`` modules exceeds the budget. The budget
+is the median of ``--runs`` fresh interpreters.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# only loaded when the bot actually connects or handles messages
+HEAVY = (
+    "neonize",
+    "magic",
+    "cachetools",
+    "watchdog",
+    "phonenumbers",
+    "termcolor",
+    "difflib",
+    "google.protobuf",
+    "http.server",
+    "cProfile",
+)
+
+DEFAULT_STMT = "from luna import BaseCommand"
+
+
+def importtime(stmt: str) -> Tuple[Dict[str, int], List[str]]:
+    """Returns the cumulative microseconds of each top-level import and the imported modules."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", stmt],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative: Dict[str, int] = {}
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        modules.append(name.strip())
+        # nested imports are indented by two spaces per level
+        if not name[1:].startswith(" "):
+            cumulative[name.strip()] = int(cumulative_us)
+    return cumulative, modules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--stmt", default=DEFAULT_STMT)
+    parser.add_argument("--budget-ms", type=float, default=60.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    totals = []
+    modules: List[str] = []
+    for _ in range(args.runs):
+        cumulative, modules = importtime(args.stmt)
+        totals.append(
+            sum(us for name, us in cumulative.items() if name.split(".")[0] == "luna")
+        )
+    median_ms = statistics.median(totals) / 1000
+
+    heavy = sorted(
+        {
+            module
+            for module in modules
+            for prefix in HEAVY
+            if module == prefix or module.startswith(prefix + ".")
+        }
+    )
+    print(f"{args.stmt!r}: luna imports take {median_ms:.1f}ms (budget {args.budget_ms}ms)")
+
+    failed = False
+    if heavy:
+        print(f"FAIL heavy modules imported: {', '.join(heavy)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print("FAIL import time is over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
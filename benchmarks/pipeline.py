@@ -0,0 +1,186 @@
+"""
+Per-stage benchmark of the inbound message pipeline against FakeRunner.
+
+Usage::
+
+    python -m benchmarks.pipeline [-n 2000] [--save baseline.json]
+                                  [--baseline baseline.json] [--max-regression 20]
+
+Run it from the repository root so the ``commands`` package is importable.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from luna.utils import GroupSerialize, MessagePrint, MessageSerialize
+
+from benchmarks import fake
+
+STAGES = ("serialize", "group_serialize", "handle", "print", "pipeline")
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(func: Callable[[], object], iterations: int, warmup: int = 50) -> Dict:
+    for _ in range(min(warmup, iterations)):
+        func()
+    timings = []
+    perf_counter = time.perf_counter
+    for _ in range(iterations):
+        start = perf_counter()
+        func()
+        timings.append(perf_counter() - start)
+    total = sum(timings)
+    return {
+        "ops": iterations / total if total else 0.0,
+        "mean_us": statistics.fmean(timings) * 1e6,
+        "p50_us": _percentile(timings, 50) * 1e6,
+        "p99_us": _percentile(timings, 99) * 1e6,
+    }
+
+
+def scenarios(group_size: int) -> Dict[str, List]:
+    group = fake.group_jid(1)
+    big_group = fake.group_jid(2)
+    private = fake.user_jid(7)
+    sender = fake.user_jid(5)
+    original = fake.text_event("the quick brown fox jumps over the lazy dog", group, sender)
+    return {
+        "private_text": [fake.text_event("halo, apa kabar?", private)],
+        "group_text": [fake.text_event("selamat pagi semua", group, sender)],
+        f"group_{group_size}_text": [fake.text_event("halo", big_group, sender)],
+        "command": [fake.text_event("!ping", private)],
+        "mention": [
+            fake.mention_event(
+                "@6281200000001 @6281200000002 cek",
+                group,
+                sender,
+                [fake.user_jid(1), fake.user_jid(2)],
+            )
+        ],
+        "image": [fake.image_event("foto liburan", group, sender)],
+        "quoted": [
+            fake.quoted_event("setuju", group, sender, "ayo makan", fake.user_jid(3))
+        ],
+        "edit": [original, fake.edit_event(original, "the quick red fox jumps over the dog")],
+    }
+
+
+def run(iterations: int, group_size: int) -> Dict[str, Dict[str, Dict]]:
+    runner = fake.FakeRunner()
+    runner.group_sizes[fake.group_jid(2)] = group_size
+    results: Dict[str, Dict[str, Dict]] = {}
+
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        for name, events in scenarios(group_size).items():
+            # earlier events (the original of an edit) only prime the chat store
+            for event in events[:-1]:
+                MessagePrint(MessageSerialize(runner, event).serialize())()
+            event = events[-1]
+            msg = MessageSerialize(runner, event).serialize()
+            group_info = runner.group_metadata(msg.chat) if msg.is_group else None
+
+            # handle skips message ids it already dispatched, so every
+            # iteration gets a fresh one
+            def handle():
+                msg.id = fake.message_id()
+                runner.command_handler.handle(msg)
+
+            def pipeline():
+                event.Info.ID = fake.message_id()
+                m = MessageSerialize(runner, event).serialize()
+                runner.command_handler.handle(m)
+                MessagePrint(m)()
+
+            stages = {
+                "serialize": lambda: MessageSerialize(runner, event).serialize(),
+                "handle": handle,
+                "print": lambda: MessagePrint(msg)(),
+                "pipeline": pipeline,
+            }
+            if group_info is not None:
+                stages["group_serialize"] = lambda: GroupSerialize.serialize(
+                    group_info, bot_jid=fake.BOT_JID, sender_jid=msg.sender
+                )
+            results[name] = {}
+            for stage in STAGES:
+                if stage in stages:
+                    results[name][stage] = measure(stages[stage], iterations)
+                    out.seek(0)
+                    out.truncate()
+    return results
+
+
+def report(
+    results: Dict[str, Dict[str, Dict]], baseline: Optional[Dict] = None
+) -> List:
+    baseline = baseline or {}
+    regressions = []
+    print(f"{'scenario':<18} {'stage':<16} {'ops/s':>10} {'p50 us':>9} {'p99 us':>9}")
+    for name, stages in results.items():
+        for stage, stats in stages.items():
+            line = (
+                f"{name:<18} {stage:<16} {stats['ops']:>10.0f} "
+                f"{stats['p50_us']:>9.1f} {stats['p99_us']:>9.1f}"
+            )
+            base = baseline.get(name, {}).get(stage)
+            if base:
+                delta = (stats["p50_us"] - base["p50_us"]) / base["p50_us"] * 100
+                line += f"  {delta:+6.1f}% p50"
+                regressions.append((f"{name}/{stage}", delta))
+            print(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", "--iterations", type=int, default=2000)
+    parser.add_argument("--group-size", type=int, default=1000)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against a saved JSON file")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=20.0,
+        help="fail when a stage's p50 is this many percent slower than the baseline",
+    )
+    args = parser.parse_args(argv)
+
+    results = run(args.iterations, args.group_size)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    regressions = report(results, baseline)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "iterations": args.iterations,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+    slow = [(stage, delta) for stage, delta in regressions if delta > args.max_regression]
+    for stage, delta in slow:
+        print(f"REGRESSION {stage}: {delta:+.1f}%")
+    return 1 if slow else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Replay a recorded inbound event log through the pipeline against FakeRunner.
+
+Record one in production with ``RECORD_EVENTS=events.log``, then::
+
+    python -m benchmarks.replay events.log              # original speed
+    python -m benchmarks.replay events.log --speed 10   # 10x faster
+    python -m benchmarks.replay events.log --fast       # as fast as possible
+
+``--fast`` applies backpressure instead of shedding, so its throughput is the
+maximum sustainable msgs/sec. ``--synthesize N`` writes a synthetic log of N
+messages first.
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import sys
+import time
+
+from neonize.events import MessageEv
+
+from luna.recorder import MAGIC, RECORD_HEADER, read_events
+
+from benchmarks import fake
+
+
+def synthesize(path: str, count: int, rate: float = 50.0) -> None:
+    """Writes ``count`` fake messages arriving at ``rate`` msgs/sec on average."""
+    groups = [fake.group_jid(i) for i in range(20)]
+    texts = ["halo", "!ping", "selamat pagi", "wkwk", "ok siap", "cek " * 40]
+    arrival = time.time()
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        for i in range(count):
+            chat = random.choice(groups) if random.random() < 0.8 else fake.user_jid(i % 50)
+            sender = fake.user_jid(random.randrange(500))
+            data = fake.text_event(random.choice(texts), chat, sender).SerializeToString()
+            arrival += random.expovariate(rate)
+            f.write(RECORD_HEADER.pack(arrival, len(data)) + data)
+
+
+def replay(path: str, speed: float, fast: bool, workers: int, policy: str):
+    runner = fake.FakeRunner(
+        with_event_handler=True,
+        record_events="",
+        ingress_workers=workers,
+        ingress_policy="backpressure" if fast else policy,
+    )
+    handler = runner.event
+    events = list(read_events(path))
+    if not events:
+        print("empty log")
+        return
+
+    first = events[0][0]
+    lag = 0.0
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for arrival, data in events:
+            message = MessageEv.FromString(data)
+            message.Info.Timestamp = int(time.time())
+            if not fast:
+                due = start + (arrival - first) / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    lag = max(lag, -delay)
+            handler.on_message(runner, message)
+        fed = time.perf_counter() - start
+
+        ingress = handler.ingress
+        if ingress is not None:
+            while len(ingress):
+                time.sleep(0.001)
+            ingress.stop()
+        elapsed = time.perf_counter() - start
+
+    stats = ingress.stats if ingress is not None else None
+    processed = stats.processed if stats else len(events)
+    print(f"events        {len(events)}")
+    print(f"fed in        {fed:.2f}s (max feed lag {lag * 1000:.1f}ms)")
+    print(f"drained in    {elapsed:.2f}s")
+    print(f"processed     {processed} ({processed / elapsed:.0f} msgs/sec)")
+    print(f"middleware    {handler.middleware.stats()}")
+    if stats:
+        print(f"dropped       {stats.dropped + stats.sampled_out}")
+        print(f"queue wait    avg {stats.avg_wait * 1000:.1f}ms max {stats.max_wait * 1000:.1f}ms")
+    print(f"replies sent  {len(runner.sent)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("log")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--fast", action="store_true")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--policy", default="drop_oldest")
+    parser.add_argument("--synthesize", type=int, metavar="N")
+    args = parser.parse_args(argv)
+
+    if args.synthesize:
+        synthesize(args.log, args.synthesize)
+    replay(args.log, args.speed, args.fast, args.workers, args.policy)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
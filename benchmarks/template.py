@@ -0,0 +1,75 @@
+"""
+Compare ``Runner.relay_message`` against ``Runner.send_template``.
+
+Nothing is sent, FakeRunner stands in for ``send_message`` so only the
+message building cost is measured.
+
+Usage::
+
+    python -m benchmarks.template [iterations]
+"""
+
+import sys
+import time
+
+from neonize.proto import def_pb2 as wa_proto
+
+from benchmarks import fake
+
+MENU = "\n".join(f"{i}. !command{i} - description of command {i}" for i in range(40))
+
+
+class _Quoted:
+    def __init__(self):
+        self._message = fake.text_event("!menu", fake.user_jid(1))
+
+
+def _bench(name: str, func, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<28} {elapsed * 1e6 / iterations:8.2f} us/op "
+        f"{iterations / elapsed:10.0f} op/s"
+    )
+    return elapsed
+
+
+def main(iterations: int = 20000):
+    runner = fake.FakeRunner()
+    quoted = _Quoted()
+    to = "6281234567890@s.whatsapp.net"
+
+    def relay_text():
+        runner.relay_message(
+            to, wa_proto.ExtendedTextMessage(text=MENU), quoted  # type: ignore
+        )
+
+    text_template = runner.make_template(wa_proto.ExtendedTextMessage(text=MENU))
+
+    def template_text():
+        runner.send_template(to, text_template, quoted)  # type: ignore
+
+    def relay_unquoted():
+        runner.relay_message(to, wa_proto.Message(extendedTextMessage={"text": MENU}))
+
+    def template_unquoted():
+        runner.send_template(to, text_template)
+
+    results = {}
+    for name, func in (
+        ("relay_message (quoted)", relay_text),
+        ("send_template (quoted)", template_text),
+        ("relay_message", relay_unquoted),
+        ("send_template", template_unquoted),
+    ):
+        results[name] = _bench(name, func, iterations)
+
+    for base in ("relay_message (quoted)", "relay_message"):
+        other = base.replace("relay_message", "send_template")
+        print(f"{other} speedup: {results[base] / results[other]:.2f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,76 @@
+import re
+import time
+
+from luna import BaseCommand
+from luna.wa_classes import Message
+
+PAGE_SIZE = 10
+OPTION = re.compile(r"^(tipe|hari|hal):(\S+)$", re.I)
+TYPES = {
+    # long or formatted text, and text with a link preview, is extended
+    "teks": ["conversation", "extendedTextMessage"],
+    "text": ["conversation", "extendedTextMessage"],
+    "gambar": "imageMessage",
+    "image": "imageMessage",
+    "video": "videoMessage",
+    "audio": "audioMessage",
+    "stiker": "stickerMessage",
+    "sticker": "stickerMessage",
+    "dokumen": "documentMessage",
+    "document": "documentMessage",
+}
+
+
+class Find(BaseCommand):
+    pattern: str = r"(find|cari)"
+    tags = ["main"]
+    description = "Search messages in this chat"
+    usage = "find <kata> [@user] [tipe:gambar] [hari:7] [hal:2]"
+
+    def execute(self, m: Message):
+        store = m.runner.store
+        if store is None:
+            m.reply("Pencarian tidak aktif, set MESSAGE_STORE=1")
+            return
+
+        words, msg_type, since, page = [], None, None, 1
+        for word in m.body.split():
+            if option := OPTION.match(word):
+                key, value = option[1].lower(), option[2].lower()
+                if key == "tipe" and value in TYPES:
+                    msg_type = TYPES[value]
+                elif key == "hari" and value.isdigit():
+                    since = int(time.time()) - int(value) * 86400
+                elif key == "hal" and value.isdigit():
+                    page = max(1, int(value))
+            elif not (word.startswith("@") and m.mentioned_jid):
+                words.append(word)
+        query = " ".join(words)
+        if not query:
+            m.reply(self.get_usage(m.used_prefix))
+            return
+
+        result = store.search(
+            query,
+            chat=m.chat,
+            sender=m.mentioned_jid[0] if m.mentioned_jid else None,
+            msg_type=msg_type,
+            since=since,
+            limit=PAGE_SIZE,
+            offset=(page - 1) * PAGE_SIZE,
+        )
+        if not result.results:
+            m.reply(f'Tidak ada pesan yang cocok dengan "{query}"')
+            return
+
+        pages = -(-result.total // PAGE_SIZE)
+        lines = [f'*Hasil "{query}"*: {result.total} pesan, halaman {page}/{pages}']
+        for i, found in enumerate(result.results, result.offset + 1):
+            at = time.strftime("%d/%m/%y %H:%M", time.localtime(found.timestamp))
+            name = m.runner.get_name(found.sender)
+            lines.append(f"{i}. {at} {name}: {found.snippet}")
+        if result.has_more:
+            args = [w for w in m.body.split() if not w.lower().startswith("hal:")]
+            command = f"{m.used_prefix}{m.command} {' '.join(args)} hal:{page + 1}"
+            lines.append(f"\nHalaman berikutnya: {command}")
+        m.reply("\n".join(lines))
@@ -1,27 +1,204 @@
-import subprocess
+import os
+import queue
 import shlex
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
 
 from luna.command import BaseCommand
+from luna.config import EXEC_TIMEOUT
 from luna.wa_classes import Message
 
+# at most one reply of CHUNK_SIZE bytes every FLUSH_INTERVAL seconds
+CHUNK_SIZE = 3000
+FLUSH_INTERVAL = 1.5
+# past this much output the whole output is sent as one file instead
+FILE_THRESHOLD = 12000
+MAX_FILE_SIZE = 10 * 1024 * 1024
+
+
+class Output:
+    """Output not sent yet, spooled to a temporary file past FILE_THRESHOLD."""
+
+    def __init__(self):
+        self.head = bytearray()
+        self.sent = 0
+        self.size = 0
+        self.file: Optional[tempfile.SpooledTemporaryFile] = None
+
+    @property
+    def spooled(self) -> bool:
+        return self.file is not None
+
+    @property
+    def pending(self) -> bool:
+        return self.file is None and self.sent < len(self.head)
+
+    def feed(self, data: bytes):
+        self.size += len(data)
+        if self.file is not None:
+            if self.file.tell() < MAX_FILE_SIZE:
+                self.file.write(data)
+            return
+        self.head += data
+        if len(self.head) > FILE_THRESHOLD:
+            # the file gets the whole output, including what was already sent
+            self.file = tempfile.SpooledTemporaryFile(max_size=FILE_THRESHOLD * 4)
+            self.file.write(self.head)
+            self.head.clear()
+
+    def next_chunk(self) -> str:
+        end = min(len(self.head), self.sent + CHUNK_SIZE)
+        if end < len(self.head):
+            newline = self.head.rfind(b"\n", self.sent, end)
+            if newline > self.sent:
+                end = newline + 1
+        chunk = self.head[self.sent : end]
+        self.sent = end
+        return chunk.decode("utf-8", "replace")
+
+    def read(self) -> bytes:
+        self.file.seek(0)
+        return self.file.read()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class Job:
+    def __init__(self, m: Message, cmd: list[str]):
+        self.m = m
+        self.cmd = cmd
+        self.process: Optional[subprocess.Popen] = None
+        self.cancelled = False
+        self.timed_out = False
+        self.output_size = 0
+
+    def kill(self):
+        if self.process is not None and self.process.poll() is None:
+            # the command runs in its own session, kill its children too
+            os.killpg(self.process.pid, signal.SIGKILL)
+
 
 class Exec(BaseCommand):
     pattern: str = r"(.*)"
     prefix = "$"
     owner_only = True
+    description = "Run a shell command, $cancel stops the running ones in this chat"
+
+    jobs: Dict[int, Job] = {}
+    _lock = threading.Lock()
 
     def execute(self, m: Message):
-        cmd = f"{m.command} {m.body}"
-        cmd = shlex.split(cmd)
-        print(cmd)
+        if m.command == "cancel":
+            self.cancel(m)
+            return
+        try:
+            cmd = shlex.split(f"{m.command} {m.body}")
+        except ValueError as e:
+            m.reply(f"Error: {e}")
+            return
+        job = Job(m, cmd)
+        threading.Thread(target=self.run, args=(job,), daemon=True).start()
+
+    def cancel(self, m: Message):
+        pid = int(m.body) if m.body.strip().isdigit() else None
+        with self._lock:
+            jobs = [
+                job
+                for job_pid, job in self.jobs.items()
+                if job.m.chat == m.chat and pid in (None, job_pid)
+            ]
+        for job in jobs:
+            job.cancelled = True
+            job.kill()
+        m.reply(
+            f"{len(jobs)} proses dibatalkan" if jobs else "Tidak ada proses berjalan"
+        )
+
+    def run(self, job: Job):
+        m = job.m
+        start = time.monotonic()
         try:
-            process = subprocess.Popen(
-                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            job.process = subprocess.Popen(
+                job.cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                stdin=subprocess.DEVNULL,
+                start_new_session=True,
             )
-            out, err = process.communicate()
-            if out:
-                m.reply(out.decode("utf-8"))
-            if err:
-                m.reply(err.decode("utf-8"))
         except Exception as e:
             m.reply(f"Error: {e}")
+            return
+
+        pid = job.process.pid
+        with self._lock:
+            self.jobs[pid] = job
+        try:
+            output = self.stream(job, start + EXEC_TIMEOUT)
+            code = job.process.wait()
+        finally:
+            with self._lock:
+                self.jobs.pop(pid, None)
+
+        elapsed = time.monotonic() - start
+        if output is not None:
+            m.reply_file(
+                output.read(),
+                f"Output {' '.join(job.cmd)[:100]}",
+                filename="output.txt",
+                as_document=True,
+            )
+            output.close()
+        if job.timed_out:
+            m.reply(f"Dihentikan, melebihi batas waktu {EXEC_TIMEOUT} detik")
+        elif job.cancelled:
+            m.reply(f"Dibatalkan setelah {elapsed:.1f} detik")
+        elif code != 0 or not job.output_size or elapsed > FLUSH_INTERVAL:
+            m.reply(f"Selesai dengan kode {code} dalam {elapsed:.1f} detik")
+
+    def stream(self, job: Job, deadline: float) -> Optional[Output]:
+        """
+        Sends the output in paced chunks while the process runs. Returns the
+        output once it grew past FILE_THRESHOLD, to be sent as a file.
+        """
+        chunks: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        stdout = job.process.stdout
+
+        def read():
+            for data in iter(lambda: stdout.read1(4096), b""):
+                chunks.put(data)
+            chunks.put(None)
+
+        threading.Thread(target=read, daemon=True).start()
+
+        output = Output()
+        eof = False
+        last_reply = 0.0
+        while True:
+            if not eof:
+                try:
+                    data = chunks.get(timeout=FLUSH_INTERVAL)
+                    while data is not None:
+                        output.feed(data)
+                        data = chunks.get_nowait()
+                    eof = True
+                except queue.Empty:
+                    pass
+
+            if output.pending and time.monotonic() - last_reply >= FLUSH_INTERVAL:
+                job.m.reply(output.next_chunk())
+                last_reply = time.monotonic()
+            elif eof and not output.pending:
+                job.output_size = output.size
+                return output if output.spooled else None
+            elif eof:
+                time.sleep(FLUSH_INTERVAL)
+
+            if not eof and time.monotonic() > deadline:
+                job.timed_out = True
+                job.kill()
@@ -0,0 +1,22 @@
+from luna.command import BaseCommand
+from luna.wa_classes import Message
+
+
+class Memory(BaseCommand):
+    pattern: str = r"mem(ory)?"
+    owner_only = True
+    tags = ["owner"]
+    description = "Top allocation sites and their growth, needs MEMWATCH_INTERVAL"
+    usage = ("memory [n]", "memory check")
+
+    def execute(self, m: Message):
+        memwatch = m.runner.memwatch
+        if memwatch is None:
+            m.reply("Memory watch tidak aktif, set MEMWATCH_INTERVAL")
+            return
+        arg = m.body.strip().lower()
+        if arg == "check":
+            if not memwatch.check():
+                m.reply("Tidak ada lokasi yang tumbuh melewati batas")
+            return
+        m.reply(memwatch.report(int(arg) if arg.isdigit() else None))
@@ -0,0 +1,74 @@
+import re
+
+from luna.command import BaseCommand
+from luna.profiler import MODES, ProfileResult, profiler
+from luna.wa_classes import Message
+
+LIMIT = re.compile(r"^(\d+)(s|msg)$", re.I)
+
+
+class Profile(BaseCommand):
+    pattern: str = r"profile"
+    owner_only = True
+    tags = ["owner"]
+    description = "Profile command handling for N seconds or N messages"
+    usage = (
+        "profile start [sampling|cprofile] [30s|50msg] [command]",
+        "profile stop",
+        "profile status",
+    )
+
+    def execute(self, m: Message):
+        action, *args = m.body.split() or ["status"]
+        match action.lower():
+            case "start":
+                self.start(m, args)
+            case "stop":
+                if not profiler.stop():
+                    m.reply("Profiler tidak sedang berjalan")
+            case "status":
+                m.reply("Profiler aktif" if profiler.active else "Profiler tidak aktif")
+            case _:
+                m.reply(self.get_usage(m.used_prefix))
+
+    def start(self, m: Message, args: list[str]):
+        mode = "sampling"
+        seconds, messages, command = 30.0, None, None
+        for arg in args:
+            if arg.lower() in MODES:
+                mode = arg.lower()
+            elif limit := LIMIT.match(arg):
+                value, unit = int(limit[1]), limit[2].lower()
+                if unit == "s":
+                    seconds, messages = value, None
+                else:
+                    seconds, messages = None, value
+            else:
+                command = arg
+
+        if command and not m.runner.command_handler.get_command(command):
+            m.reply(f"Command {command} tidak ditemukan")
+            return
+
+        def on_done(result: ProfileResult):
+            m.reply(
+                f"Profile {result.mode} selesai: {result.messages} pesan, "
+                f"{result.duration:.1f} detik\n\n{result.top}"
+            )
+            if result.collapsed:
+                m.runner.send_file(
+                    m.chat,
+                    result.collapsed.encode(),
+                    caption="profile",
+                    filename="profile.collapsed.txt",
+                    quoted=m,
+                    as_document=True,
+                )
+
+        try:
+            profiler.start(mode, seconds, messages, command, on_done)
+        except RuntimeError as e:
+            m.reply(str(e))
+            return
+        limit_text = f"{seconds:g} detik" if seconds else f"{messages} pesan"
+        m.reply(f"Profiler {mode} berjalan selama {limit_text}")
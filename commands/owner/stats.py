@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+
+import psutil
+
+from luna.command import (
+    COMMAND_CALLS,
+    COMMAND_ERRORS,
+    EXECUTE_SECONDS,
+    BaseCommand,
+)
+from luna.metrics import metrics
+from luna.wa_classes import Message
+
+PROCESS = psutil.Process()
+# commands are imported while the bot starts
+START_RSS = PROCESS.memory_info().rss
+
+
+def _mb(size: float) -> str:
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+def _signed_mb(size: float) -> str:
+    return f"{'+' if size >= 0 else '-'}{_mb(abs(size))}"
+
+
+def _duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f"{days}h {hours}j {minutes}m"
+    return f"{hours}j {minutes}m {seconds}d"
+
+
+def _dir_size(path: str) -> tuple[int, int]:
+    total = files = 0
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return 0, 0
+    for entry in entries:
+        try:
+            if entry.is_file(follow_symlinks=False):
+                total += entry.stat(follow_symlinks=False).st_size
+                files += 1
+            elif entry.is_dir(follow_symlinks=False):
+                size, count = _dir_size(entry.path)
+                total += size
+                files += count
+        except OSError:
+            continue
+    return total, files
+
+
+class Stats(BaseCommand):
+    pattern: str = r"stats"
+    owner_only = True
+    tags = ["owner"]
+    description = "Show memory, queues, caches and command latencies"
+    usage = "stats"
+
+    last_rss = START_RSS
+
+    def execute(self, m: Message):
+        m.reply(self.runtime(m) + "\n\n" + self.commands())
+
+    def runtime(self, m: Message) -> str:
+        runner = m.runner
+        rss = PROCESS.memory_info().rss
+        since_last, Stats.last_rss = rss - Stats.last_rss, rss
+        lines = [
+            "*Stats*",
+            f"Uptime: {_duration(time.time() - PROCESS.create_time())}",
+            f"RSS: {_mb(rss)} ({_signed_mb(rss - START_RSS)} sejak start, "
+            f"{_signed_mb(since_last)} sejak terakhir)",
+            f"Threads: {threading.active_count()} python, "
+            f"{PROCESS.num_threads()} proses",
+        ]
+
+        event = runner.event
+        # ThreadPoolExecutor has no public queue size
+        lines.append(f"Executor queue: {event.executor._work_queue.qsize()}")
+        if event.ingress is not None:
+            depth = event.ingress.depth
+            stats = event.ingress.stats
+            lines.append(
+                f"Ingress: {depth['priority']} prioritas, {depth['normal']} normal, "
+                f"{stats.dropped + stats.sampled_out} dibuang, "
+                f"tunggu avg {stats.avg_wait * 1000:.0f}ms"
+            )
+
+        chat_messages = metrics.get("luna_chat_store_messages_total")
+        lines.append(
+            f"Chat store: {len(runner.chats)} chat, "
+            f"{chat_messages.get() if chat_messages else 0:.0f} pesan"
+        )
+
+        cache_requests = metrics.get("luna_cache_requests_total")
+        for cache in (runner.group_cache, runner.contact_cache):
+            hits = cache_requests.get(cache=cache.name, result="hit")
+            misses = cache_requests.get(cache=cache.name, result="miss")
+            rate = hits / (hits + misses) * 100 if hits + misses else 0
+            lines.append(
+                f"Cache {cache.name}: {len(cache)} entri, hit {rate:.1f}% "
+                f"({hits:.0f}/{hits + misses:.0f})"
+            )
+
+        lines.append(f"Scheduler: {len(runner.scheduler)} job")
+
+        size, files = _dir_size("tmp")
+        lines.append(f"Tmp: {_mb(size)} ({files} file)")
+        return "\n".join(lines)
+
+    def commands(self) -> str:
+        rows = []
+        for labels in EXECUTE_SECONDS.label_values():
+            name = labels["command"]
+            count, total = EXECUTE_SECONDS.summary(command=name)
+            p90 = EXECUTE_SECONDS.quantile(0.9, command=name)
+            p90_text = (
+                f"<= {p90 * 1000:.0f}ms"
+                if p90 != float("inf")
+                else f"> {EXECUTE_SECONDS.buckets[-1]:g}s"
+            )
+            rows.append(
+                (
+                    count,
+                    f"{name}: {COMMAND_CALLS.get(command=name):.0f}x, "
+                    f"{COMMAND_ERRORS.get(command=name):.0f} error, "
+                    f"avg {total / count * 1000:.0f}ms, p90 {p90_text}",
+                )
+            )
+        if not rows:
+            return "*Commands*\nBelum ada command yang dijalankan"
+        rows.sort(key=lambda row: row[0], reverse=True)
+        return "*Commands*\n" + "\n".join(text for _, text in rows)
@@ -0,0 +1,80 @@
+import re
+import time
+
+from luna import BaseCommand
+from luna.wa_classes import Message
+
+DELAY = re.compile(r"^(\d+)(s|m|h|d|detik|menit|jam|hari)$", re.I)
+UNITS = {
+    "s": 1,
+    "detik": 1,
+    "m": 60,
+    "menit": 60,
+    "h": 3600,
+    "jam": 3600,
+    "d": 86400,
+    "hari": 86400,
+}
+MAX_DELAY = 365 * 86400
+
+
+class Remind(BaseCommand):
+    pattern: str = r"(remind|ingatkan)"
+    tags = ["main"]
+    description = "Send a reminder to this chat later, kept across restarts"
+    usage = ("remind 30m <pesan>", "remind list", "remind hapus <nomor>")
+
+    def execute(self, m: Message):
+        action, _, rest = m.body.strip().partition(" ")
+        match action.lower():
+            case "list":
+                self.list(m)
+            case "hapus":
+                self.cancel(m, rest.strip())
+            case _:
+                self.add(m, action, rest.strip())
+
+    def reminders(self, m: Message):
+        return [
+            job
+            for job in m.runner.scheduler.jobs()
+            if job.name == "reminder" and job.payload["chat"] == m.chat
+        ]
+
+    def add(self, m: Message, delay: str, text: str):
+        match = DELAY.match(delay)
+        if not match or not text:
+            m.reply(self.get_usage(m.used_prefix))
+            return
+        seconds = int(match[1]) * UNITS[match[2].lower()]
+        if not 0 < seconds <= MAX_DELAY:
+            m.reply("Waktu pengingat harus antara 1 detik dan 365 hari")
+            return
+        at = time.time() + seconds
+        m.runner.remind(m.chat, f"*Pengingat*\n{text}", at, m.sender)
+        when = time.strftime("%d/%m/%y %H:%M", time.localtime(at))
+        m.reply(f"Pengingat diset untuk {when}")
+
+    def list(self, m: Message):
+        jobs = self.reminders(m)
+        if not jobs:
+            m.reply("Tidak ada pengingat di chat ini")
+            return
+        lines = ["*Pengingat*"]
+        for i, job in enumerate(jobs, 1):
+            at = time.strftime("%d/%m/%y %H:%M", time.localtime(job.at))
+            text = job.payload["text"].removeprefix("*Pengingat*\n")
+            lines.append(f"{i}. {at} {text[:60]}")
+        m.reply("\n".join(lines))
+
+    def cancel(self, m: Message, number: str):
+        jobs = self.reminders(m)
+        if not number.isdigit() or not 0 < int(number) <= len(jobs):
+            m.reply("Nomor pengingat tidak ditemukan")
+            return
+        job = jobs[int(number) - 1]
+        if job.payload["sender"] != m.sender and m.sender not in m.runner.owners:
+            m.reply("Hanya pembuat pengingat yang bisa menghapusnya")
+            return
+        m.runner.scheduler.cancel(job)
+        m.reply("Pengingat dihapus")
@@ -1,4 +1,5 @@
-from .command import BaseCommand, CommandHandler
+from typing import TYPE_CHECKING
+
 from .config import (
     BOT_NAME,
     BOT_PREFIX,
@@ -6,8 +7,20 @@ from .config import (
     DIR_SESSION,
     OWNERS_NUMBER,
 )
-from .core import Runner
-from .events import EventHandler
+
+if TYPE_CHECKING:
+    from .command import BaseCommand, CommandHandler
+    from .core import Runner
+    from .events import EventHandler
+
+# Heavy modules (neonize, magic, watchdog, ...) are only imported on first
+# access, so importing BaseCommand stays cheap.
+_LAZY = {
+    "Runner": ".core",
+    "EventHandler": ".events",
+    "BaseCommand": ".command",
+    "CommandHandler": ".command",
+}
 
 __all__ = [
     "Runner",
@@ -20,3 +33,13 @@ __all__ = [
     "BOT_PREFIX",
     "DIR_COMMANDS",
 ]
+
+
+def __getattr__(name: str):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+
+    value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
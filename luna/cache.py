@@ -0,0 +1,326 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+from cachetools import TTLCache
+
+from luna.utils import logger
+
+
+class CacheBackend(ABC):
+    """
+    A bounded key-value cache whose entries expire ``ttl`` seconds after
+    they are set. Every backend is safe to share between threads.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+    @abstractmethod
+    def get(self, key: str, default: Any = None) -> Any: ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any) -> None: ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Removes ``key`` here and in every process sharing the backend."""
+
+    @abstractmethod
+    def clear(self) -> None: ...
+
+    @abstractmethod
+    def items(self) -> Iterator[Tuple[str, Any]]: ...
+
+    @abstractmethod
+    def __len__(self) -> int: ...
+
+    def update(self, entries: Dict[str, Any], at: Optional[float] = None) -> None:
+        """Sets many entries, fetched at ``at`` when they are older than now."""
+        for key, value in entries.items():
+            self.set(key, value)
+
+
+class MemoryCache(CacheBackend):
+    """Process local cache on top of :class:`cachetools.TTLCache`."""
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        super().__init__(name, maxsize, ttl)
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            return self._cache.get(key, default)
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._cache[key] = value
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        with self._lock:
+            items = list(self._cache.items())
+        return iter(items)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._cache)
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache shared by every process opening the same SQLite file in WAL mode.
+
+    Decoded values are also kept in a process local :class:`MemoryCache`
+    until the row they were read from expires.
+
+    Deletes and overwrites are appended to an ``invalidations`` table that
+    each process reads at most every ``sync_interval`` seconds to drop its
+    local copies, so a change reaches the other processes within that delay.
+    A process skips the invalidations it wrote itself.
+    """
+
+    _schema = """
+        CREATE TABLE IF NOT EXISTS cache (
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value BLOB NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (namespace, key)
+        );
+        CREATE INDEX IF NOT EXISTS cache_expires ON cache (namespace, expires_at);
+        CREATE TABLE IF NOT EXISTS invalidations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            namespace TEXT NOT NULL,
+            key TEXT,
+            at REAL NOT NULL
+        );
+    """
+    # drop expired rows and old invalidations every this many writes
+    trim_every = 64
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        ttl: float,
+        path: str,
+        sync_interval: float = 0.5,
+    ):
+        super().__init__(name, maxsize, ttl)
+        self.path = path
+        self.sync_interval = sync_interval
+        # key -> (expires_at, value)
+        self._local = MemoryCache(name, maxsize, ttl)
+        self._threads = threading.local()
+        self._sync_lock = threading.Lock()
+        self._next_sync = 0.0
+        self._writes = 0
+        # ids of the invalidations written by this process
+        self._own: Set[int] = set()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(self._schema)
+            row = conn.execute("SELECT MAX(id) FROM invalidations").fetchone()
+        self._last_seen = row[0] or 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._threads, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._threads.conn = conn
+        return conn
+
+    def _sync(self) -> None:
+        now = time.monotonic()
+        if now < self._next_sync or not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_sync = now + self.sync_interval
+            rows = self._conn().execute(
+                "SELECT id, key FROM invalidations WHERE id > ? AND namespace = ?",
+                (self._last_seen, self.name),
+            ).fetchall()
+            if not rows:
+                return
+            self._last_seen = rows[-1][0]
+            for row_id, key in rows:
+                if row_id in self._own:
+                    self._own.discard(row_id)
+                elif key is None:
+                    self._local.clear()
+                else:
+                    self._local.delete(key)
+        finally:
+            self._sync_lock.release()
+
+    def _invalidate(self, conn: sqlite3.Connection, key: Optional[str]) -> None:
+        row_id = conn.execute(
+            "INSERT INTO invalidations (namespace, key, at) VALUES (?, ?, ?)",
+            (self.name, key, time.time()),
+        ).lastrowid
+        self._own.add(row_id)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        self._sync()
+        now = time.time()
+        local = self._local.get(key)
+        if local is not None and local[0] > now:
+            return local[1]
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM cache "
+            "WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (self.name, key, now),
+        ).fetchone()
+        if row is None:
+            return default
+        try:
+            value = pickle.loads(row[0])
+        except Exception as e:
+            logger.warn(f"Dropping undecodable {self.name} cache entry {key}: {e}")
+            self.delete(key)
+            return default
+        self._local.set(key, (row[1], value))
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._sync()
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        expires_at = time.time() + self.ttl
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                (self.name, key, data, expires_at),
+            )
+            self._invalidate(conn, key)
+            self._local.set(key, (expires_at, value))
+            self._evict(conn)
+        self._writes += 1
+        if self._writes % self.trim_every == 0:
+            self._trim()
+
+    def update(self, entries: Dict[str, Any], at: Optional[float] = None) -> None:
+        """
+        Sets many entries in one transaction. With ``at``, the time they were
+        fetched, an entry only replaces a row that expires before ``at + ttl``,
+        so e.g. an old snapshot never overwrites what another process fetched
+        since, and only fills in what is missing or expired.
+        """
+        self._sync()
+        now = time.time()
+        expires_at = now + self.ttl
+        fetched_expiry = (now if at is None else at) + self.ttl
+        with self._conn() as conn:
+            for key, value in entries.items():
+                cursor = conn.execute(
+                    "INSERT INTO cache VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (namespace, key) DO UPDATE "
+                    "SET value = excluded.value, expires_at = excluded.expires_at "
+                    "WHERE cache.expires_at < ?",
+                    (
+                        self.name,
+                        key,
+                        pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                        expires_at,
+                        fetched_expiry,
+                    ),
+                )
+                if cursor.rowcount:
+                    self._invalidate(conn, key)
+                    self._local.set(key, (expires_at, value))
+            self._evict(conn)
+        self._trim()
+
+    def delete(self, key: str) -> None:
+        with self._conn() as conn:
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key = ?", (self.name, key)
+            )
+            self._invalidate(conn, key)
+        self._local.delete(key)
+
+    def clear(self) -> None:
+        with self._conn() as conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ?", (self.name,))
+            self._invalidate(conn, None)
+        self._local.clear()
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Deletes the entries closest to expiry above ``maxsize``, like TTLCache."""
+        count = conn.execute(
+            "SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.name,)
+        ).fetchone()[0]
+        if count <= self.maxsize:
+            return
+        evicted = conn.execute(
+            "SELECT key FROM cache WHERE namespace = ? ORDER BY expires_at LIMIT ?",
+            (self.name, count - self.maxsize),
+        ).fetchall()
+        conn.executemany(
+            "DELETE FROM cache WHERE namespace = ? AND key = ?",
+            [(self.name, key) for key, in evicted],
+        )
+        for key, in evicted:
+            self._invalidate(conn, key)
+            self._local.delete(key)
+
+    def _trim(self) -> None:
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND expires_at <= ?",
+                (self.name, now),
+            )
+            # every process syncs far more often than this
+            conn.execute("DELETE FROM invalidations WHERE at < ?", (now - 3600,))
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT key, value FROM cache WHERE namespace = ? AND expires_at > ?",
+            (self.name, time.time()),
+        ).fetchall()
+        for key, data in rows:
+            try:
+                yield key, pickle.loads(data)
+            except Exception:
+                continue
+
+    def __len__(self) -> int:
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM cache WHERE namespace = ? AND expires_at > ?",
+            (self.name, time.time()),
+        ).fetchone()
+        return row[0]
+
+
+BACKENDS = ("memory", "sqlite")
+
+
+def make_cache(
+    name: str,
+    maxsize: int,
+    ttl: float,
+    backend: str = "memory",
+    path: str = "",
+) -> CacheBackend:
+    if backend == "memory":
+        return MemoryCache(name, maxsize, ttl)
+    if backend == "sqlite":
+        return SQLiteCache(name, maxsize, ttl, path)
+    raise ValueError(f"Unknown cache backend {backend!r}, expected one of {BACKENDS}")
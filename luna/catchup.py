@@ -0,0 +1,61 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set
+
+from luna.utils import logger
+
+
+@dataclass
+class CatchUpStats:
+    messages: int = 0
+    chats: Set[str] = field(default_factory=set)
+    oldest: int = 0
+    newest: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+
+class CatchUp:
+    """
+    Counts messages ingested without being dispatched, per source
+    (``"offline"`` for the backlog delivered on reconnect, ``"history"`` for
+    history sync), and logs one summary per source when it is done.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, CatchUpStats] = {}
+        self._lock = threading.Lock()
+
+    def add(self, source: str, chat: str, timestamp: int) -> None:
+        with self._lock:
+            stats = self._sources.get(source)
+            if stats is None:
+                stats = self._sources[source] = CatchUpStats(oldest=timestamp)
+            stats.messages += 1
+            stats.chats.add(chat)
+            stats.oldest = min(stats.oldest, timestamp)
+            stats.newest = max(stats.newest, timestamp)
+
+    def progress(self, source: str) -> Optional[CatchUpStats]:
+        return self._sources.get(source)
+
+    def finish(self, source: str, stored: int = -1) -> Optional[CatchUpStats]:
+        """Logs the summary for ``source`` and starts counting it afresh."""
+        with self._lock:
+            stats = self._sources.pop(source, None)
+        if stats is None:
+            logger.debug(f"Catch-up {source} done, nothing to ingest")
+            return None
+        span = ""
+        if stats.oldest:
+            span = (
+                f" from {time.strftime('%Y-%m-%d %H:%M', time.localtime(stats.oldest))}"
+                f" to {time.strftime('%Y-%m-%d %H:%M', time.localtime(stats.newest))}"
+            )
+        logger.info(
+            f"Catch-up {source} done: {stats.messages} messages in "
+            f"{len(stats.chats)} chats{span}, "
+            f"{time.monotonic() - stats.started_at:.1f}s"
+            + (f", {stored} stored so far" if stored >= 0 else "")
+        )
+        return stats
@@ -3,27 +3,68 @@ import inspect
 import pathlib
 import re
 import string
+import time
 from enum import Enum
-from typing import TYPE_CHECKING, Optional, Set, Tuple, Union
-
-from watchdog.events import (
-    FileDeletedEvent,
-    FileModifiedEvent,
-    FileSystemEventHandler,
-)
-from watchdog.observers import Observer
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Set, Tuple, Union
 
+from luna.metrics import metrics
+from luna.profiler import profiler
+from luna.tracing import tracer
 from luna.utils import logger
 
 if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    from watchdog.events import (
+        FileDeletedEvent,
+        FileModifiedEvent,
+        FileSystemEvent,
+    )
+
+    from luna.dedup import RecentIds
+    from luna.offload import ProcessOffloader
+    from luna.quota import QuotaManager
+    from luna.replycache import ReplyCache
     from luna.wa_classes import Message
 
 
+DISPATCH_SECONDS = metrics.histogram(
+    "luna_dispatch_seconds", "Time spent in CommandHandler.handle"
+)
+VALIDATE_SECONDS = metrics.histogram(
+    "luna_command_validate_seconds", "Time spent validating a command", ["command"]
+)
+EXECUTE_SECONDS = metrics.histogram(
+    "luna_command_execute_seconds", "Time spent executing a command", ["command"]
+)
+COMMAND_CALLS = metrics.counter(
+    "luna_command_calls_total", "Number of executed commands", ["command"]
+)
+COMMAND_ERRORS = metrics.counter(
+    "luna_command_errors_total", "Number of commands that raised", ["command"]
+)
+COMMAND_REJECTED = metrics.counter(
+    "luna_command_rejected_total", "Number of commands refused by validation", ["command"]
+)
+REPLY_CACHE_REQUESTS = metrics.counter(
+    "luna_reply_cache_requests_total",
+    "Commands with cache_ttl by result: hit, shared (waited on a running call) or miss",
+    ["command", "result"],
+)
+COMMAND_DUPLICATES = metrics.counter(
+    "luna_command_duplicates_total",
+    "Number of redelivered messages not dispatched again",
+    ["command"],
+)
+
+
 class PermissionError(Enum):
     GROUP_ONLY = "Perintah ini hanya bisa digunakan di grup"
     PRIVATE_ONLY = "Perintah ini hanya bisa digunakan di private chat"
     SUPERADMIN_ONLY = "Perintah ini hanya bisa digunakan oleh owner grup"
     ADMIN_ONLY = "Perintah ini hanya bisa digunakan oleh admin grup"
+    PREMIUM_ONLY = "Perintah ini hanya bisa digunakan oleh user premium"
+    LIMIT_REACHED = "Batas penggunaan perintah ini sudah habis, coba lagi nanti"
     OWNER_ONLY = True
 
 
@@ -45,6 +86,20 @@ class BaseCommand:
     superadmin_only: bool = False
     premium_only: bool = False
     limit_usage: int = 0
+    # count limit_usage per "user" or per "chat"
+    limit_scope: str = "user"
+    # run execute in a worker process, for CPU-bound commands
+    run_in_process: bool = False
+    process_timeout: float = 30
+    # prefetch the message media so m.download() works in the worker
+    process_download: bool = False
+    # send the same replies again for cache_ttl seconds instead of executing,
+    # only m.reply and m.reply_file made before execute returns are cached, so
+    # never those of a run_in_process command
+    cache_ttl: float = 0
+    # who shares a cached reply: "global", "chat" or "user"
+    cache_scope: str = "chat"
+    cache_maxsize: int = 128
     name: str = ""
     tags: Optional[Union[str, list[str]]] = None
     description: str = ""
@@ -87,6 +142,12 @@ class BaseCommand:
 
     def execute(self, m: "Message", *args, **kwargs): ...
 
+    def cache_key(self, m: "Message") -> str:
+        """Cached replies key, by default scope, command and normalized body."""
+        scope = self.cache_scope
+        owner = m.chat if scope == "chat" else m.sender if scope == "user" else ""
+        return f"{scope}:{owner}:{m.command.lower()}:{' '.join(m.body.lower().split())}"
+
     def match(self, text: str):
         if self._pattern:
             return self._pattern.search(text)
@@ -121,21 +182,61 @@ CommandPair = Tuple[CommandPathLike, BaseCommand]
 SetOfCommand = Set[CommandPair]
 
 
+def discover_commands(directory: pathlib.Path) -> List[pathlib.Path]:
+    """Lists the command modules under ``directory``, adding missing ``__init__.py`` files."""
+    paths = []
+    for path in directory.iterdir():
+        if path.name.startswith("__") or path.name.startswith("."):
+            continue
+
+        if path.is_dir():
+            if not any(path.iterdir()):
+                continue
+
+            init_file = path / "__init__.py"
+            init_file.touch(exist_ok=True)
+            paths.extend(discover_commands(directory / path.name))
+
+        elif path.suffix == ".py":
+            paths.append(path)
+    return paths
+
+
 class CommandHandler:
     def __init__(
-        self, dir_commands: str = "commands", prefix: str = string.punctuation
+        self,
+        dir_commands: str = "commands",
+        prefix: str = string.punctuation,
+        watch: bool = True,
+        manifest: Optional[Sequence[CommandPathLike]] = None,
+        dedup: Optional["RecentIds"] = None,
+        quota: Optional["QuotaManager"] = None,
     ):
         self.commands: SetOfCommand = set()
+        # message ids already dispatched, redeliveries after a reconnect are skipped
+        self.dedup = dedup
+        # premium users and limit_usage counters, unchecked without it
+        self.quota = quota
         self.dir = pathlib.Path(dir_commands)
+        self._offloader: Optional["ProcessOffloader"] = None
+        self._reply_caches: Dict[str, "ReplyCache"] = {}
         self._prefix = re.compile(f"^[{re.escape(prefix)}]", re.I)
-        self.load_commands()
-        self._observer = Observer()
+        if manifest is None:
+            self.load_commands()
+        else:
+            # a supervisor already walked the directory for every session
+            for path in manifest:
+                self._import_and_register(pathlib.Path(path))
+        self._observer = None
 
-        self._watcher = self._observer.schedule(
-            FileReloader(self), self.dir, recursive=True
-        )
+        if watch:
+            from watchdog.observers import Observer
 
-        self._observer.start()
+            self._observer = Observer()
+            self._watcher = self._observer.schedule(
+                FileReloader(self), self.dir, recursive=True
+            )
+            self._observer.start()
 
     def load_command(self, path: pathlib.Path, reload: bool = False):
         try:
@@ -147,21 +248,8 @@ class CommandHandler:
         if directory is None:
             directory = self.dir
 
-        for path in directory.iterdir():
-            if path.name.startswith("__") or path.name.startswith("."):
-                continue
-
-            if path.is_dir():
-                if not any(path.iterdir()):
-                    continue
-
-                init_file = path / "__init__.py"
-                init_file.touch(exist_ok=True)
-                dir_name = directory / path.name
-                self.load_commands(dir_name)
-
-            elif path.suffix == ".py":
-                self._import_and_register(path)
+        for path in discover_commands(directory):
+            self._import_and_register(path)
 
     def _import_and_register(self, path: pathlib.Path, reload: bool = False) -> None:
         try:
@@ -189,6 +277,7 @@ class CommandHandler:
                 reload = True
                 self.commands.remove(c)
                 break
+        self._reply_caches.pop(command.name, None)
         logger.info(
             f"{'re - ' if reload else ''}Registering {command.name} from {command_path}"
         )
@@ -211,7 +300,20 @@ class CommandHandler:
     def get_commands(self) -> SetOfCommand:
         return self.commands
 
+    def is_command_text(self, text: str) -> bool:
+        """Cheap check whether ``text`` starts with any command prefix."""
+        if self._prefix.search(text):
+            return True
+        for _, command in self.commands:
+            if (cmd_prefix := command.get_prefix()) and cmd_prefix.search(text):
+                return True
+        return False
+
     def handle(self, m: "Message") -> None:
+        with DISPATCH_SECONDS.time(), profiler.capture():
+            self._handle(m)
+
+    def _handle(self, m: "Message") -> None:
         if m.is_bot:
             return
 
@@ -234,7 +336,15 @@ class CommandHandler:
                 match_command = command.match(used_command)
                 if not match_command:
                     continue
-                if error := self.validate(m, command):
+                if self.dedup is not None and self.dedup.seen(f"{m.chat}:{m.id}"):
+                    COMMAND_DUPLICATES.inc(command=command.name)
+                    return
+                with VALIDATE_SECONDS.time(command=command.name), tracer.span(
+                    "validate", command=command.name
+                ):
+                    error = self.validate(m, command)
+                if error:
+                    COMMAND_REJECTED.inc(command=command.name)
                     if isinstance(error, str):
                         m.reply(error)
                     return
@@ -242,9 +352,81 @@ class CommandHandler:
                 m.body = body
                 m.used_prefix = match_prefix[0]
                 if command.exec_is_overridden:
-                    command.execute(m)
+                    self.execute(m, command)
                     return
 
+    @property
+    def offloader(self) -> "ProcessOffloader":
+        if self._offloader is None:
+            from luna.config import OFFLOAD_WORKERS
+            from luna.offload import ProcessOffloader
+
+            self._offloader = ProcessOffloader(OFFLOAD_WORKERS)
+        return self._offloader
+
+    def execute(self, m: "Message", command: BaseCommand) -> None:
+        COMMAND_CALLS.inc(command=command.name)
+        try:
+            if command.cache_ttl:
+                self._execute_cached(m, command)
+            else:
+                self._execute(m, command)
+        except Exception:
+            COMMAND_ERRORS.inc(command=command.name)
+            raise
+
+    def _execute(self, m: "Message", command: BaseCommand) -> None:
+        if command.run_in_process:
+            self._execute_in_process(m, command)
+            return
+        with EXECUTE_SECONDS.time(command=command.name), profiler.capture(
+            command.name
+        ), tracer.span("execute", command=command.name):
+            command.execute(m)
+
+    def _execute_cached(self, m: "Message", command: BaseCommand) -> None:
+        from luna.replycache import ReplyCache, ReplyRecorder, replay
+
+        cache = self._reply_caches.get(command.name)
+        if cache is None:
+            cache = self._reply_caches.setdefault(
+                command.name, ReplyCache(command.cache_maxsize, command.cache_ttl)
+            )
+
+        def run():
+            with ReplyRecorder(m) as recorder:
+                self._execute(m, command)
+            return recorder.actions
+
+        actions, result = cache.get_or_run(command.cache_key(m), run)
+        REPLY_CACHE_REQUESTS.inc(command=command.name, result=result)
+        if result != "miss":
+            with tracer.span("replay", command=command.name):
+                replay(m, actions)
+
+    def _execute_in_process(self, m: "Message", command: BaseCommand) -> None:
+        """Hands ``command`` to a worker process and returns, replies come later."""
+        from luna.offload import OffloadTimeout
+
+        started = time.perf_counter()
+        with tracer.span("offload", command=command.name):
+            future = self.offloader.submit(m, command)
+
+        def done(future: "Future[None]") -> None:
+            EXECUTE_SECONDS.observe(time.perf_counter() - started, command=command.name)
+            error = future.exception()
+            if error is None:
+                return
+            COMMAND_ERRORS.inc(command=command.name)
+            if isinstance(error, OffloadTimeout):
+                logger.warn(str(error))
+                timeout = command.process_timeout
+                m.reply(f"Perintah dihentikan karena melebihi {timeout} detik")
+            else:
+                logger.error(f"Error executing {command.name} in a worker: {error}")
+
+        future.add_done_callback(done)
+
     def validate(
         self, m: "Message", command: BaseCommand
     ) -> Optional[Union[str, bool]]:
@@ -266,16 +448,40 @@ class CommandHandler:
             if command.group_only:
                 return PermissionError.GROUP_ONLY.value
 
+        quota = self.quota
+        if quota is None or not (command.premium_only or command.limit_usage):
+            return None
+        if m.sender in m.runner.owners or quota.is_premium(m.sender):
+            return None
+        if command.premium_only:
+            return PermissionError.PREMIUM_ONLY.value
+        scope = m.chat if command.limit_scope == "chat" else m.sender
+        if not quota.acquire(
+            f"{command.limit_scope}:{scope}:{command.name}", command.limit_usage
+        ):
+            return PermissionError.LIMIT_REACHED.value
+
+
+class FileReloader:
+    """
+    Watchdog event handler, only ``dispatch`` is needed by the observer so
+    watchdog itself is not imported until the watcher starts.
+    """
 
-class FileReloader(FileSystemEventHandler):
     def __init__(self, handler: CommandHandler):
         self.handler = handler
 
-    def on_modified(self, event: FileModifiedEvent):
+    def dispatch(self, event: "FileSystemEvent"):
+        if event.event_type == "modified":
+            self.on_modified(event)  # type: ignore
+        elif event.event_type == "deleted":
+            self.on_deleted(event)  # type: ignore
+
+    def on_modified(self, event: "FileModifiedEvent"):
         if event.is_directory:
             return
         if event.src_path.endswith(".py"):
             self.handler.load_command(pathlib.Path(event.src_path), reload=True)
 
-    def on_deleted(self, event: FileDeletedEvent):
+    def on_deleted(self, event: "FileDeletedEvent"):
         self.handler.unregister(event.src_path)
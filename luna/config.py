@@ -6,9 +6,60 @@ from dotenv import load_dotenv
 load_dotenv()
 
 BOT_NAME = os.environ.get("BOT_NAME", "anv")
+# Comma separated session names, each runs as its own process under a supervisor
+BOT_SESSIONS = [name.strip() for name in os.environ.get("BOT_SESSIONS", "").split(",") if name.strip()]
 DIR_COMMANDS = os.environ.get("DIR_COMMANDS", "commands")
 BOT_PREFIX = os.environ.get("PREFIX", "!")
 DIR_SESSION = os.environ.get("DIR_SESSION", "sessions")
 OWNERS_NUMBER = [num.strip() + "@s.whatsapp.net" for num in os.environ.get("OWNERS_NUMBER", "").split(",") if num]
+# Messages older than this many seconds are dropped before serialization, 0 disables it
+MAX_MESSAGE_AGE = int(os.environ.get("MAX_MESSAGE_AGE", 0))
+# Trace allocations and alert the owners when an allocation site grew by
+# MEMWATCH_THRESHOLD_MB, checked every MEMWATCH_INTERVAL seconds (0 disables it)
+MEMWATCH_INTERVAL = int(os.environ.get("MEMWATCH_INTERVAL", 0))
+MEMWATCH_THRESHOLD_MB = float(os.environ.get("MEMWATCH_THRESHOLD_MB", 10))
+# Stack frames kept per allocation, more gives better sites but costs more memory
+MEMWATCH_FRAMES = int(os.environ.get("MEMWATCH_FRAMES", 1))
+# Commands with limit_usage run at most that many times per user (or chat) within QUOTA_WINDOW seconds
+QUOTA_WINDOW = int(os.environ.get("QUOTA_WINDOW", 86400))
+# Comma separated numbers allowed to use premium_only commands, exempt from usage limits
+PREMIUM_NUMBERS = [num.strip() + "@s.whatsapp.net" for num in os.environ.get("PREMIUM_NUMBERS", "").split(",") if num]
+# Messages older than this many seconds (offline backlog, history sync) are only
+# stored, never dispatched to commands or printed, 0 disables it
+CATCHUP_CUTOFF = int(os.environ.get("CATCHUP_CUTOFF", 300))
+# Keep messages in sessions/<name>.messages.sqlite3, searchable with the find command
+MESSAGE_STORE = os.environ.get("MESSAGE_STORE", "0") == "1"
+# Stored messages older than this many days are pruned daily, 0 keeps them forever
+MESSAGE_RETENTION_DAYS = float(os.environ.get("MESSAGE_RETENTION_DAYS", 30))
+# Inbound queue, INGRESS_WORKERS=0 processes messages on the neonize callback thread.
+# Messages of one chat stay in order with more workers, but commands then run
+# concurrently across chats, so only raise it once they are safe to
+INGRESS_MAXSIZE = int(os.environ.get("INGRESS_MAXSIZE", 1000))
+INGRESS_POLICY = os.environ.get("INGRESS_POLICY", "drop_oldest")
+INGRESS_WORKERS = int(os.environ.get("INGRESS_WORKERS", 1))
+# Local Prometheus /metrics endpoint, METRICS_PORT=0 disables it
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 0))
+METRICS_ADDR = os.environ.get("METRICS_ADDR", "127.0.0.1")
+# Write tracing spans as JSON lines to this file, empty disables tracing
+TRACE_FILE = os.environ.get("TRACE_FILE", "")
+# Append every raw inbound message to this log for offline replay, empty disables it
+RECORD_EVENTS = os.environ.get("RECORD_EVENTS", "")
+# Where group metadata and contacts are cached, "memory" per process or "sqlite"
+# shared by every process using the same CACHE_PATH
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+CACHE_PATH = os.environ.get("CACHE_PATH", f"{DIR_SESSION}/cache.sqlite3")
+# Message ids dispatched within DEDUP_WINDOW seconds are not dispatched again, 0 disables it
+DEDUP_WINDOW = int(os.environ.get("DEDUP_WINDOW", 600))
+DEDUP_MAXSIZE = int(os.environ.get("DEDUP_MAXSIZE", 10000))
+# Keep the dispatched ids in sessions/<name>.dedup across restarts
+DEDUP_PERSIST = os.environ.get("DEDUP_PERSIST", "1") == "1"
+# Seconds before an owner $ command is killed
+EXEC_TIMEOUT = int(os.environ.get("EXEC_TIMEOUT", 60))
+# Worker processes for commands with run_in_process, started on first use
+OFFLOAD_WORKERS = int(os.environ.get("OFFLOAD_WORKERS", 2))
+# Warm-start snapshot of the caches, saved every SNAPSHOT_INTERVAL seconds and on exit (0 saves only on exit)
+SNAPSHOT_INTERVAL = int(os.environ.get("SNAPSHOT_INTERVAL", 300))
+# Snapshots older than this many seconds are ignored, 0 disables the snapshot
+SNAPSHOT_MAX_AGE = int(os.environ.get("SNAPSHOT_MAX_AGE", 86400))
 
 __all__ = ["BOT_NAME", "DIR_COMMANDS", "BOT_PREFIX"]
\ No newline at end of file
@@ -1,20 +1,59 @@
+import atexit
 import mimetypes
 import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
 from io import BytesIO
-from typing import TYPE_CHECKING, Optional, Union
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, List, Optional, Union
 
-import magic
-from cachetools import TTLCache, cached
 from neonize.client import NewClient
 from neonize.proto import Neonize_pb2 as neonize_proto
 from neonize.proto import def_pb2 as wa_proto
+from neonize.utils.enum import ParticipantChange
 from neonize.utils.iofile import get_bytes_from_name_or_url
+from luna.cache import CacheBackend, make_cache
 from luna.command import CommandHandler
+from luna.dedup import RecentIds
+from luna.quota import QuotaManager
 
-from luna.config import DIR_SESSION, OWNERS_NUMBER
+from luna.config import (
+    CACHE_BACKEND,
+    CACHE_PATH,
+    DEDUP_MAXSIZE,
+    DEDUP_PERSIST,
+    DEDUP_WINDOW,
+    DIR_SESSION,
+    MEMWATCH_FRAMES,
+    MEMWATCH_INTERVAL,
+    MEMWATCH_THRESHOLD_MB,
+    MESSAGE_RETENTION_DAYS,
+    MESSAGE_STORE,
+    METRICS_ADDR,
+    METRICS_PORT,
+    OWNERS_NUMBER,
+    PREMIUM_NUMBERS,
+    QUOTA_WINDOW,
+    SNAPSHOT_INTERVAL,
+    SNAPSHOT_MAX_AGE,
+    TRACE_FILE,
+)
 from luna.events import EventHandler
-from luna.utils import jid_to_str, str_to_jid, logger
-from luna.wa_classes import Message, UserInfo
+from luna.memwatch import MemoryWatch
+from luna.metrics import metrics, start_http_server
+from luna.scheduler import Job, Scheduler
+from luna.snapshot import SnapshotManager
+from luna.store import MessageStore
+from luna.tracing import JsonLinesExporter, tracer
+from luna.utils import MessageTemplate, jid_to_str, str_to_jid, logger
+from luna.wa_classes import (
+    BulkParticipantResult,
+    GroupParticipant,
+    Message,
+    ParticipantResult,
+    UserInfo,
+)
 
 
 if TYPE_CHECKING:
@@ -39,6 +78,34 @@ MessageWithContextInfo = (
     wa_proto.EventMessage,
 )
 
+SEND_SECONDS = metrics.histogram(
+    "luna_send_seconds", "Time spent sending a message", ["method"]
+)
+CACHE_REQUESTS = metrics.counter(
+    "luna_cache_requests_total", "Cache lookups by result", ["cache", "result"]
+)
+
+# participants per update request, concurrent requests and seconds between
+# starting two of them
+PARTICIPANT_CHUNK_SIZE = 20
+PARTICIPANT_CONCURRENCY = 3
+PARTICIPANT_CHUNK_DELAY = 1.0
+
+
+def clear_tmp(directory: str = "tmp", max_age: float = 86400) -> None:
+    """Removes files in ``directory`` older than ``max_age`` seconds."""
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError as e:
+            logger.error(f"Failed to remove {entry.path}: {e}")
+
 
 class Runner(NewClient):
     def __init__(self, name: str, **kwargs):
@@ -54,22 +121,165 @@ class Runner(NewClient):
         os.makedirs(DIR_SESSION, exist_ok=True)
         super().__init__(f"{DIR_SESSION}/{name}.sqlite3")
         self.bot_name = name
-        self.command_handler = CommandHandler(kwargs.get("dir_commands", "commands"))
+        self._close_hooks: List[Callable[[], None]] = []
+        # messages sent by a thread inside capture_sent
+        self._sent = threading.local()
+        atexit.register(self.close)
+        dedup = None
+        if DEDUP_WINDOW:
+            dedup = RecentIds(
+                DEDUP_WINDOW,
+                DEDUP_MAXSIZE,
+                f"{DIR_SESSION}/{name}.dedup" if DEDUP_PERSIST else "",
+            )
+            self._on_close(dedup.close)
+        quota = QuotaManager(
+            f"{DIR_SESSION}/{name}.quota.sqlite3", QUOTA_WINDOW, PREMIUM_NUMBERS
+        )
+        self._on_close(quota.close)
+        self.command_handler = CommandHandler(
+            kwargs.get("dir_commands", "commands"),
+            manifest=kwargs.get("manifest"),
+            dedup=dedup,
+            quota=quota,
+        )
+        # created before the event handler so it closes after ingress stops
+        self.store = None
+        if MESSAGE_STORE:
+            self.store = MessageStore(
+                f"{DIR_SESSION}/{name}.messages.sqlite3",
+                retention=MESSAGE_RETENTION_DAYS * 86400,
+            )
+            self._on_close(self.store.close)
         self.event = EventHandler(self)
+        atexit.unregister(self.event.shutdown_thread)
+        self._on_close(self.event.shutdown_thread)
+        # timers share the event executor, see Scheduler
+        self.scheduler = Scheduler(
+            self.event.executor, f"{DIR_SESSION}/{name}.schedule.sqlite3"
+        )
+        self.scheduler.handle("reminder", self._send_reminder)
+        self.scheduler.every(60 * 60 * 24, clear_tmp, name="clear_tmp", jitter=600)
+        quota.start(self.scheduler)
+        if self.store is not None:
+            self.store.start(self.scheduler)
+        self._on_close(self.scheduler.stop)
         self.owners = OWNERS_NUMBER
         self.chats = {}
         self.tokovoucher = {}
+        self.group_cache = make_cache(
+            "group_metadata", 1024, 300, CACHE_BACKEND, CACHE_PATH
+        )
+        self.contact_cache = make_cache("contacts", 4096, 600, CACHE_BACKEND, CACHE_PATH)
+        self.snapshot = None
+        if SNAPSHOT_MAX_AGE:
+            self.snapshot = SnapshotManager(
+                self,
+                f"{DIR_SESSION}/{name}.snapshot",
+                interval=SNAPSHOT_INTERVAL,
+                max_age=SNAPSHOT_MAX_AGE,
+            )
+            self.snapshot.load()
+            self._on_close(self.snapshot.stop)
+        self.memwatch = None
+        if MEMWATCH_INTERVAL:
+            self.memwatch = MemoryWatch(
+                self,
+                MEMWATCH_INTERVAL,
+                int(MEMWATCH_THRESHOLD_MB * 1024 * 1024),
+                frames=MEMWATCH_FRAMES,
+            )
+            self._on_close(self.memwatch.stop)
+        self._register_gauges()
+        if TRACE_FILE:
+            tracer.set_exporter(JsonLinesExporter(TRACE_FILE))
+
+    def _on_close(self, hook: Callable[[], None]) -> None:
+        self._close_hooks.append(hook)
+
+    def close(self) -> None:
+        """
+        Stops the components and writes back what they buffer, last created
+        first, like atexit would. Runs once, also on a normal interpreter exit.
+        """
+        hooks, self._close_hooks = self._close_hooks, []
+        for hook in reversed(hooks):
+            try:
+                hook()
+            except Exception as e:
+                logger.error(f"Error while closing {hook}: {e}")
+
+    def _register_gauges(self):
+        metrics.gauge(
+            "luna_cache_size",
+            "Number of entries in a cache",
+            lambda: {
+                (self.group_cache.name,): len(self.group_cache),
+                (self.contact_cache.name,): len(self.contact_cache),
+            },
+            ["cache"],
+        )
+        if self.event.ingress is not None:
+            metrics.gauge(
+                "luna_ingress_depth",
+                "Number of messages waiting in the ingress queue",
+                lambda: {(lane,): n for lane, n in self.event.ingress.depth.items()},
+                ["lane"],
+            )
+            metrics.gauge(
+                "luna_ingress_wait_seconds",
+                "Ingress queue wait time",
+                lambda: {
+                    ("avg",): self.event.ingress.stats.avg_wait,
+                    ("max",): self.event.ingress.stats.max_wait,
+                    ("last",): self.event.ingress.stats.last_wait,
+                },
+                ["stat"],
+            )
+        metrics.gauge(
+            "luna_middleware_dropped",
+            "Messages dropped before serialization by stage",
+            lambda: {(k,): v for k, v in self.event.middleware.stats().items()},
+            ["stage"],
+        )
 
     def initialize_owner(self):
         self.owners.append(self.user_info.jid)
 
-    def run(self):
+    def run(self, serve_metrics: bool = True):
+        if serve_metrics and METRICS_PORT:
+            start_http_server(METRICS_PORT, METRICS_ADDR)
+        self.scheduler.start()
+        if self.snapshot is not None:
+            self.snapshot.start(self.scheduler)
+        if self.memwatch is not None:
+            self.memwatch.start(self.scheduler)
         self.connect()
 
-    @cached(cache=TTLCache(maxsize=1024, ttl=300))
+    def _cached(self, cache: CacheBackend, key: str, fetch):
+        value = cache.get(key)
+        if value is not None:
+            CACHE_REQUESTS.inc(cache=cache.name, result="hit")
+            return value
+        CACHE_REQUESTS.inc(cache=cache.name, result="miss")
+        value = fetch()
+        cache.set(key, value)
+        return value
+
     def group_metadata(self, chat: str):
-        group_jid = str_to_jid(chat)
-        return self.get_group_info(group_jid)
+        with tracer.span("group_metadata"):
+            return self._cached(
+                self.group_cache,
+                chat,
+                lambda: self.get_group_info(str_to_jid(chat)),
+            )
+
+    def get_contact(self, jid: str):
+        return self._cached(
+            self.contact_cache,
+            jid,
+            lambda: self.contact.get_contact(str_to_jid(jid)),
+        )
 
     @property
     def user_info(self) -> UserInfo:
@@ -120,7 +330,61 @@ class Runner(NewClient):
 
         logger.debug(f"Relaying message to {to}")
         logger.debug(f"Message: {build_message}")
-        return super().send_message(to, build_message)
+        with SEND_SECONDS.time(method="relay_message"), tracer.span("relay_message"):
+            return super().send_message(to, build_message)
+
+    def send_message(
+        self,
+        to: neonize_proto.JID,
+        message: Union[wa_proto.Message, str],
+        link_preview: bool = False,
+    ) -> neonize_proto.SendResponse:
+        captured = getattr(self._sent, "messages", None)
+        if captured is not None and isinstance(message, wa_proto.Message):
+            captured.append(message)
+        return super().send_message(to, message, link_preview)
+
+    @contextmanager
+    def capture_sent(self) -> Iterator[List[wa_proto.Message]]:
+        """
+        Collects the messages this thread sends meanwhile, as built, so a
+        media message keeps the reference to its upload and can be relayed.
+        """
+        previous = getattr(self._sent, "messages", None)
+        self._sent.messages = captured = []
+        try:
+            yield captured
+        finally:
+            self._sent.messages = previous
+
+    def make_template(
+        self, message: Union[wa_proto.Message, "MessageWithContextInfoType"]
+    ) -> MessageTemplate:
+        """
+        Builds a reusable template for a static message body.
+
+        :param message: The message to prebuild.
+        :return: A template to pass to :meth:`send_template`.
+        """
+        msg_type = self.get_message_type(message)
+        if not isinstance(message, wa_proto.Message):
+            build_message = wa_proto.Message()
+            getattr(build_message, msg_type).MergeFrom(message)
+            message = build_message
+        return MessageTemplate(message, msg_type)
+
+    def send_template(
+        self,
+        to: Union[neonize_proto.JID, str],
+        template: MessageTemplate,
+        quoted: Optional[Message] = None,
+    ):
+        if not isinstance(to, neonize_proto.JID):
+            to = str_to_jid(to)
+
+        context_info = self._make_quoted_message(quoted._message) if quoted else None
+        with SEND_SECONDS.time(method="send_template"), tracer.span("send_template"):
+            return super().send_message(to, template.build(context_info))
 
     def get_message_type(
         self, message: Union[wa_proto.Message, "MessageWithContextInfoType", str]
@@ -157,7 +421,11 @@ class Runner(NewClient):
         self.chats[to]["messages"][msg.ID] = message
         return msg
 
-    def send_file(
+    def send_file(self, *args, **kwargs):
+        with SEND_SECONDS.time(method="send_file"), tracer.span("send_file"):
+            return self._send_file(*args, **kwargs)
+
+    def _send_file(
         self,
         to: str,
         file: Union[str, bytes],
@@ -168,21 +436,23 @@ class Runner(NewClient):
         as_document: bool = False,
         ptt: bool = False,
     ):
-        if quoted:
-            quoted_message = quoted._message
+        import magic
+
+        quoted_message = quoted._message if quoted else None
         jid = str_to_jid(to)
         io = BytesIO(get_bytes_from_name_or_url(file))
         io.seek(0)
         buff = io.read()
-        mime = magic.from_buffer(buff)
+        mime = magic.from_buffer(buff, mime=True)
+        mime_type = mime.split("/")[0]
 
-        if as_document or "application" in mime:
-            ext = mimetypes.guess_extension(mime[0])
-            filename = f"{caption}{ext}"
+        if as_document or mime_type == "application":
+            ext = mimetypes.guess_extension(mime) or ""
+            filename = filename or f"{caption}{ext}"
             return self.send_document(
                 jid, buff, caption, title, filename, quoted_message
             )
-        match mime[0]:
+        match mime_type:
             case "image":
                 return self.send_image(jid, buff, caption, quoted_message)
             case "audio":
@@ -190,14 +460,148 @@ class Runner(NewClient):
             case "video":
                 return self.send_video(jid, buff, caption, quoted_message)
             case _:
-                ext = mimetypes.guess_extension(mime[0])
-                filename = f"{caption}{ext}"
+                ext = mimetypes.guess_extension(mime) or ""
+                filename = filename or f"{caption}{ext}"
                 return self.send_document(
-                    jid, buff, title, caption, filename, quoted_message
+                    jid, buff, caption, title, filename, quoted_message
                 )
 
+    def _participant_jids(
+        self, chat: str, participants: Optional[Iterable[Union[str, GroupParticipant]]]
+    ) -> List[str]:
+        if participants is None:
+            participants = (
+                jid_to_str(p.JID) for p in self.group_metadata(chat).Participants
+            )
+        # dict keeps the order and drops duplicates
+        return list(
+            dict.fromkeys(
+                p.jid if isinstance(p, GroupParticipant) else p for p in participants
+            )
+        )
+
+    def mention_all(
+        self,
+        chat: str,
+        text: str = "",
+        participants: Optional[Iterable[Union[str, GroupParticipant]]] = None,
+        quoted: Optional[Message] = None,
+        hidden: bool = False,
+    ):
+        """
+        Sends one message mentioning every participant of ``chat``.
+
+        :param participants: Who to mention instead of every group member.
+        :param hidden: Mention without listing the tags in the text.
+        """
+        jids = self._participant_jids(chat, participants)
+        if not hidden:
+            tags = " ".join(f"@{jid.split('@')[0]}" for jid in jids)
+            text = f"{text}\n\n{tags}" if text else tags
+        message = wa_proto.ExtendedTextMessage(
+            text=text, contextInfo=wa_proto.ContextInfo(mentionedJid=jids)
+        )
+        return self.relay_message(chat, message, quoted)
+
+    def update_participants(
+        self,
+        chat: str,
+        participants: Iterable[Union[str, GroupParticipant]],
+        action: Union[ParticipantChange, str],
+        chunk_size: int = PARTICIPANT_CHUNK_SIZE,
+        concurrency: int = PARTICIPANT_CONCURRENCY,
+        delay: float = PARTICIPANT_CHUNK_DELAY,
+    ) -> "Future[BulkParticipantResult]":
+        """
+        Adds, removes, promotes or demotes many participants at once.
+
+        The list is split in requests of ``chunk_size`` members, started
+        ``delay`` seconds apart by the scheduler with up to ``concurrency`` of
+        them in flight, so the caller is never blocked by the pacing. A failed
+        request marks its members failed without stopping the others.
+
+        :param action: A :class:`ParticipantChange` or its value, e.g. ``"remove"``.
+        :return: A future of one result per member, in the order given. Reply
+            from ``add_done_callback`` rather than waiting on it in a command.
+        """
+        action = ParticipantChange(action)
+        jids = self._participant_jids(chat, participants)
+        group = str_to_jid(chat)
+        chunks = [jids[i : i + chunk_size] for i in range(0, len(jids), chunk_size)]
+        future: "Future[BulkParticipantResult]" = Future()
+        if not chunks:
+            future.set_result(BulkParticipantResult(action.value, []))
+            return future
+        done: List[List[ParticipantResult]] = [[] for _ in chunks]
+        pending = [len(chunks)]
+        lock = threading.Lock()
+        slots = threading.BoundedSemaphore(max(1, concurrency))
+
+        def update(chunk: List[str]) -> List[ParticipantResult]:
+            try:
+                with SEND_SECONDS.time(method="update_participants"):
+                    changed = self.update_group_participants(
+                        group, [str_to_jid(jid) for jid in chunk], action
+                    )
+            except Exception as e:
+                logger.error(f"Failed to {action.value} {len(chunk)} in {chat}: {e}")
+                return [ParticipantResult(jid, False, -1, str(e)) for jid in chunk]
+            errors = {}
+            for p in changed:
+                errors[jid_to_str(p.JID)] = p.Error
+                if p.HasField("LID"):
+                    errors[jid_to_str(p.LID)] = p.Error
+            return [
+                ParticipantResult(jid, not errors[jid], errors[jid])
+                if jid in errors
+                else ParticipantResult(jid, False, -2, "Not in the server response")
+                for jid in chunk
+            ]
+
+        def run(i: int) -> None:
+            if not slots.acquire(blocking=False):
+                # too many in flight, try again later instead of holding a thread
+                self.scheduler.call_later(delay, run, i, name="update_participants")
+                return
+            try:
+                with tracer.span(
+                    "update_participants", action=action.value, count=len(chunks[i])
+                ):
+                    done[i] = update(chunks[i])
+            finally:
+                slots.release()
+            with lock:
+                pending[0] -= 1
+                if pending[0]:
+                    return
+            self.group_cache.delete(chat)
+            future.set_result(
+                BulkParticipantResult(
+                    action.value, [result for chunk in done for result in chunk]
+                )
+            )
+
+        start = time.time()
+        for i in range(len(chunks)):
+            self.scheduler.call_at(
+                start + i * delay, run, i, name="update_participants"
+            )
+        return future
+
+    def remind(self, chat: str, text: str, at: float, sender: str = "") -> Job:
+        """Sends ``text`` to ``chat`` at ``at``, even if the bot restarted meanwhile."""
+        return self.scheduler.persist(
+            "reminder", at, {"chat": chat, "text": text, "sender": sender}
+        )
+
+    def _send_reminder(self, payload: dict) -> None:
+        if not self.is_connected:
+            raise ConnectionError("Not connected, reminder kept and retried")
+        with SEND_SECONDS.time(method="reminder"):
+            self.send_message(str_to_jid(payload["chat"]), payload["text"])
+
     def get_name(self, jid: str) -> str:
-        contact = self.contact.get_contact(str_to_jid(jid))
+        contact = self.get_contact(jid)
         if contact.Found:
             return contact.PushName
         return jid.split("@")[0]
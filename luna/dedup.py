@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, TextIO
+
+from luna.utils import logger
+
+
+class RecentIds:
+    """
+    Remembers ids for ``window`` seconds, keeping at most ``maxsize`` of
+    them so memory stays bounded whatever the message rate.
+
+    With ``path`` every new id is appended to a log that is read back on
+    startup, so ids stay known across restarts.
+    """
+
+    def __init__(self, window: float = 600, maxsize: int = 10000, path: str = ""):
+        self.window = window
+        self.maxsize = maxsize
+        self.path = path
+        self._ids: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._log: Optional[TextIO] = None
+        self._appended = 0
+        if path:
+            self._load()
+
+    def _expire(self, now: float) -> None:
+        ids = self._ids
+        cutoff = now - self.window
+        while ids and (len(ids) > self.maxsize or next(iter(ids.values())) <= cutoff):
+            ids.popitem(last=False)
+
+    def seen(self, key: str) -> bool:
+        """Returns whether ``key`` was seen within the window, and remembers it."""
+        now = time.time()
+        with self._lock:
+            at = self._ids.get(key)
+            if at is not None and at > now - self.window:
+                return True
+            self._ids[key] = now
+            self._ids.move_to_end(key)
+            self._expire(now)
+            if self._log is not None:
+                self._append(key, now)
+        return False
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _append(self, key: str, at: float) -> None:
+        try:
+            self._log.write(f"{at:.3f} {key}\n")
+            self._log.flush()
+        except OSError as e:
+            logger.error(f"Failed to persist message id: {e}")
+            return
+        self._appended += 1
+        if self._appended > self.maxsize:
+            self._rewrite()
+
+    def _load(self) -> None:
+        now = time.time()
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    at, _, key = line.rstrip("\n").partition(" ")
+                    try:
+                        self._ids[key] = float(at)
+                    except ValueError:
+                        continue  # torn write
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Failed to load message ids from {self.path}: {e}")
+        self._expire(now)
+        self._rewrite()
+
+    def _rewrite(self) -> None:
+        """Compacts the log down to the ids still in the window."""
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                f.writelines(f"{at:.3f} {key}\n" for key, at in self._ids.items())
+            os.replace(tmp, self.path)
+            if self._log is not None:
+                self._log.close()
+            self._log = open(self.path, "a")
+        except OSError as e:
+            logger.error(f"Failed to persist message ids to {self.path}: {e}")
+            self._log = None
+        self._appended = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
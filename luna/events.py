@@ -1,18 +1,36 @@
+import time
 from concurrent.futures import ThreadPoolExecutor
 from typing import TYPE_CHECKING, Callable, Type
 
 from neonize.events import (
     EVENT_TO_INT,
+    BlocklistEv,
     CallOfferEv,
     ConnectedEv,
     Event,
     EventType,
+    HistorySyncEv,
     MessageEv,
+    OfflineSyncCompletedEv,
 )
 from neonize.utils import log
 
 from luna import CommandHandler
-from luna.utils import MessageSerialize, MessagePrint
+from luna.catchup import CatchUp
+from luna.config import (
+    CATCHUP_CUTOFF,
+    INGRESS_MAXSIZE,
+    INGRESS_POLICY,
+    INGRESS_WORKERS,
+    MAX_MESSAGE_AGE,
+    RECORD_EVENTS,
+)
+from luna.ingress import IngressQueue
+from luna.middleware import BlockedChatFilter, default_chain
+from luna.recorder import EventRecorder
+from luna.store import from_event, from_history
+from luna.tracing import tracer
+from luna.utils import MessageSerialize, MessagePrint, get_text, jid_to_str, logger
 from luna.wa_classes import Message
 
 import atexit
@@ -34,16 +52,95 @@ class EventHandler(Event):
         super().__init__(runner)
         self.dir_commands = kwargs.get("dir_commands", "commands")
         self.executor = ThreadPoolExecutor()
+        self.middleware = kwargs.get("middleware") or default_chain(MAX_MESSAGE_AGE)
+        record_events = kwargs.get("record_events", RECORD_EVENTS)
+        self.recorder = EventRecorder(record_events) if record_events else None
+        self.catchup_cutoff = kwargs.get("catchup_cutoff", CATCHUP_CUTOFF)
+        self.catchup = CatchUp()
+        self.ingress = None
+        workers = kwargs.get("ingress_workers", INGRESS_WORKERS)
+        if workers > 0:
+            self.ingress = IngressQueue(
+                lambda message: self.process_message(runner, message),
+                maxsize=kwargs.get("ingress_maxsize", INGRESS_MAXSIZE),
+                policy=kwargs.get("ingress_policy", INGRESS_POLICY),
+                workers=workers,
+            )
+            self.ingress.start()
         self.register()
         atexit.register(self.shutdown_thread)
 
     def on_message(self, runner: "Runner", message: MessageEv):
-        msg: Message = MessageSerialize(runner, message).serialize()
-        runner.command_handler.handle(msg)
-        msg_print = MessagePrint(msg)
-        msg_print()
+        with tracer.span("on_message", trace_id=message.Info.ID):
+            self._on_message(runner, message)
+
+    def _on_message(self, runner: "Runner", message: MessageEv):
+        if self.recorder is not None:
+            self.recorder.record(message)
+        dropped = self.middleware.check(runner, message)
+        keep = dropped is None or dropped.keep_history
+        # stored before the ingress queue, so shed messages stay in the history
+        if keep and runner.store is not None:
+            runner.store.add(from_event(runner, message))
+        if (
+            self.catchup_cutoff
+            and message.Info.Timestamp < time.time() - self.catchup_cutoff
+        ):
+            if keep:
+                self.ingest(message)
+            return
+        if dropped is not None:
+            return
+        if self.ingress is None:
+            self.process_message(runner, message)
+            return
+
+        source = message.Info.MessageSource
+        priority = not source.IsGroup or jid_to_str(source.Sender) in runner.owners
+        is_command = runner.command_handler.is_command_text(get_text(message.Message))
+        if not self.ingress.put(message, priority, is_command):
+            logger.debug(f"Shed message {message.Info.ID}, ingress queue is full")
+
+    def process_message(self, runner: "Runner", message: MessageEv):
+        with tracer.span("process", trace_id=message.Info.ID):
+            with tracer.span("serialize"):
+                msg: Message = MessageSerialize(runner, message).serialize()
+            runner.command_handler.handle(msg)
+            with tracer.span("print"):
+                msg_print = MessagePrint(msg)
+                msg_print()
+
+    def ingest(self, message: MessageEv):
+        """Counts a backlog message, stored but never dispatched or printed."""
+        source = message.Info.MessageSource
+        self.catchup.add("offline", jid_to_str(source.Chat), message.Info.Timestamp)
+
+    def on_history_sync(self, runner: "Runner", history: HistorySyncEv):
+        data = history.Data
+        blocked_filter = self.middleware.get(BlockedChatFilter)
+        blocked = blocked_filter.blocked if blocked_filter is not None else set()
+        for row in from_history(runner, data):
+            # same chats the middleware keeps out of the store for live messages
+            if row.chat == "status@broadcast" or row.chat in blocked:
+                continue
+            self.catchup.add("history", row.chat, row.timestamp)
+            if runner.store is not None:
+                runner.store.add(row)
+        # progress is only sent with the bootstrap chunks, 100 on the last one
+        if not data.HasField("progress") or data.progress >= 100:
+            self.catchup.finish("history", self._stored(runner))
+
+    def on_offline_sync_completed(self, runner: "Runner", _: OfflineSyncCompletedEv):
+        self.catchup.finish("offline", self._stored(runner))
+
+    def _stored(self, runner: "Runner") -> int:
+        return runner.store.written if runner.store is not None else -1
 
     def shutdown_thread(self):
+        if self.ingress is not None:
+            self.ingress.stop(timeout=1)
+        if self.recorder is not None:
+            self.recorder.close()
         self.executor.shutdown(wait=False)
 
     def on_call(self, runner: "Runner", call: CallOfferEv):
@@ -53,11 +150,32 @@ class EventHandler(Event):
     def on_connected(self, runner: "Runner", _: ConnectedEv):
         log.info("Bot Connected!")
         runner.initialize_owner()
+        runner.scheduler.load()
+        self.refresh_blocklist(runner)
+        if runner.snapshot is not None:
+            runner.snapshot.revalidate()
+
+    def on_blocklist(self, runner: "Runner", _: BlocklistEv):
+        self.refresh_blocklist(runner)
+
+    def refresh_blocklist(self, runner: "Runner"):
+        blocked_filter = self.middleware.get(BlockedChatFilter)
+        if blocked_filter is None:
+            return
+        try:
+            blocklist = runner.get_blocklist()
+        except Exception as e:
+            log.error(f"Failed to fetch blocklist: {e}")
+            return
+        blocked_filter.update(jid_to_str(jid) for jid in blocklist.JIDs)
 
     def register(self):
         self._register_event(MessageEv, self.on_message)
         self._register_event(CallOfferEv, self.on_call)
         self._register_event(ConnectedEv, self.on_connected)
+        self._register_event(BlocklistEv, self.on_blocklist)
+        self._register_event(HistorySyncEv, self.on_history_sync)
+        self._register_event(OfflineSyncCompletedEv, self.on_offline_sync_completed)
 
     def _register_event(self, event: Type[EventType], func: Callable):
         wrapped_func = super().wrap(func, event)
@@ -0,0 +1,221 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import TYPE_CHECKING, Callable, Deque, Dict, List, Optional, Set, Union
+
+from luna.utils import logger
+
+if TYPE_CHECKING:
+    from neonize.events import MessageEv
+
+
+class OverflowPolicy(Enum):
+    DROP_OLDEST = "drop_oldest"
+    SAMPLE = "sample"
+    BACKPRESSURE = "backpressure"
+
+
+@dataclass
+class IngressItem:
+    message: "MessageEv"
+    priority: bool
+    is_command: bool
+    # chat JID, at most one message per chat is processed at a time
+    chat: str = ""
+    enqueued_at: float = field(default_factory=time.monotonic)
+    # carries the current tracing span to the worker thread
+    context: contextvars.Context = field(default_factory=contextvars.copy_context)
+
+
+@dataclass
+class IngressStats:
+    enqueued: int = 0
+    processed: int = 0
+    dropped: int = 0
+    sampled_out: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    last_wait: float = 0.0
+
+    @property
+    def avg_wait(self) -> float:
+        return self.total_wait / self.processed if self.processed else 0.0
+
+
+class IngressQueue:
+    """
+    Bounded queue between the neonize callbacks and message processing.
+
+    Private chats and owners go to a priority lane that workers drain first.
+    A worker skips messages of a chat another worker is still processing, so
+    messages of one chat and lane are handled in arrival order (an edit never
+    runs before the message it edits) even with several workers. Commands
+    touching state shared between chats must still lock it themselves when
+    ``workers`` is above 1.
+
+    When the queue is full the overflow policy decides what to shed:
+
+    - ``drop_oldest`` drops the oldest queued non-command message
+    - ``sample`` only admits one in ``sample_rate`` ordinary messages once the
+      queue is half full, then falls back to ``drop_oldest``
+    - ``backpressure`` blocks the callback for up to ``block_timeout`` seconds
+    """
+
+    def __init__(
+        self,
+        handler: Callable[["MessageEv"], None],
+        maxsize: int = 1000,
+        policy: Union[OverflowPolicy, str] = OverflowPolicy.DROP_OLDEST,
+        workers: int = 1,
+        sample_rate: int = 10,
+        block_timeout: float = 5.0,
+    ):
+        self.handler = handler
+        self.maxsize = maxsize
+        self.policy = OverflowPolicy(policy)
+        self.sample_rate = max(sample_rate, 1)
+        self.block_timeout = block_timeout
+        self.stats = IngressStats()
+        self._high: Deque[IngressItem] = deque()
+        self._normal: Deque[IngressItem] = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._sample_counter = 0
+        # chats a worker is processing a message of
+        self._busy: Set[str] = set()
+        self._running = False
+        self._threads: List[threading.Thread] = []
+        self._workers = workers
+
+    def __len__(self) -> int:
+        return len(self._high) + len(self._normal)
+
+    @property
+    def depth(self) -> Dict[str, int]:
+        return {"priority": len(self._high), "normal": len(self._normal)}
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        for i in range(self._workers):
+            thread = threading.Thread(
+                target=self._worker, name=f"ingress-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        with self._lock:
+            self._running = False
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
+
+    def put(self, message: "MessageEv", priority: bool, is_command: bool) -> bool:
+        """Queues a message, returns False if it was shed."""
+        chat = message.Info.MessageSource.Chat
+        item = IngressItem(message, priority, is_command, f"{chat.User}@{chat.Server}")
+        with self._lock:
+            if not self._admit(item):
+                return False
+            (self._high if priority else self._normal).append(item)
+            self.stats.enqueued += 1
+            self._not_empty.notify()
+        return True
+
+    def _admit(self, item: IngressItem) -> bool:
+        if self.policy is OverflowPolicy.SAMPLE and not (
+            item.priority or item.is_command
+        ):
+            if len(self) >= self.maxsize // 2:
+                self._sample_counter += 1
+                if self._sample_counter % self.sample_rate:
+                    self.stats.sampled_out += 1
+                    return False
+
+        if len(self) < self.maxsize:
+            return True
+
+        if self.policy is OverflowPolicy.BACKPRESSURE:
+            deadline = time.monotonic() + self.block_timeout
+            while len(self) >= self.maxsize and self._running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._not_full.wait(remaining)
+            if len(self) < self.maxsize:
+                return True
+            self.stats.dropped += 1
+            return False
+
+        if self._drop_oldest(item):
+            return True
+        self.stats.dropped += 1
+        return False
+
+    def _drop_oldest(self, item: IngressItem) -> bool:
+        """Makes room for ``item``, returns False if ``item`` itself should go."""
+        lanes = (self._normal,) if not item.priority else (self._normal, self._high)
+        for lane in lanes:
+            for queued in lane:
+                if not queued.is_command:
+                    lane.remove(queued)
+                    self.stats.dropped += 1
+                    return True
+        if not item.is_command:
+            return False
+        # only commands are queued, the oldest one makes room for the new command
+        for lane in lanes:
+            if lane:
+                lane.popleft()
+                self.stats.dropped += 1
+                return True
+        return False
+
+    def _take(self) -> Optional[IngressItem]:
+        """Pops the first queued message of a chat no worker is busy with."""
+        for lane in (self._high, self._normal):
+            for i, item in enumerate(lane):
+                if item.chat not in self._busy:
+                    del lane[i]
+                    self._busy.add(item.chat)
+                    return item
+        return None
+
+    def _worker(self) -> None:
+        while True:
+            with self._lock:
+                item = None
+                while self._running:
+                    item = self._take()
+                    if item is not None:
+                        break
+                    self._not_empty.wait()
+                if item is None:
+                    return
+                self._not_full.notify()
+
+                wait = time.monotonic() - item.enqueued_at
+                stats = self.stats
+                stats.processed += 1
+                stats.total_wait += wait
+                stats.last_wait = wait
+                if wait > stats.max_wait:
+                    stats.max_wait = wait
+
+            try:
+                item.context.run(self.handler, item.message)
+            except Exception as e:
+                logger.error(f"Error processing message {item.message.Info.ID}: {e}")
+            finally:
+                with self._lock:
+                    self._busy.discard(item.chat)
+                    # a message of this chat may be the only one left
+                    self._not_empty.notify()
@@ -0,0 +1,155 @@
+import linecache
+import threading
+import time
+import tracemalloc
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from neonize.proto import def_pb2 as wa_proto
+
+from luna.utils import logger
+
+if TYPE_CHECKING:
+    from luna import Runner
+    from luna.scheduler import Job, Scheduler
+
+FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _mb(size: float) -> str:
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+def _site(stat: "tracemalloc.StatisticDiff | tracemalloc.Statistic") -> str:
+    frame = stat.traceback[0]
+    line = linecache.getline(frame.filename, frame.lineno).strip()
+    return f"{frame.filename}:{frame.lineno}" + (f" `{line[:60]}`" if line else "")
+
+
+class MemoryWatch:
+    """
+    Traces allocations with :mod:`tracemalloc` and every ``interval``
+    seconds compares a snapshot against the one taken at start. Owners are
+    messaged when an allocation site grew by ``threshold`` bytes since the
+    last alert about it.
+
+    Nothing is traced until :meth:`start`, so a runner without a watch pays
+    nothing.
+    """
+
+    def __init__(
+        self,
+        runner: "Runner",
+        interval: float = 600,
+        threshold: int = 10 * 1024 * 1024,
+        top: int = 10,
+        frames: int = 1,
+    ):
+        self.runner = runner
+        self.interval = interval
+        self.threshold = threshold
+        self.top = top
+        self.frames = frames
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        # allocation site -> growth when it was last reported
+        self._alerted: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._job: Optional["Job"] = None
+
+    @property
+    def active(self) -> bool:
+        return self._baseline is not None
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(FILTERS)
+
+    def start(self, scheduler: "Scheduler") -> None:
+        if self._job is not None:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self._baseline = self._snapshot()
+        self._job = scheduler.every(self.interval, self.check, name="memwatch")
+        logger.info(f"Memory watch started, checking every {self.interval:g}s")
+
+    def stop(self) -> None:
+        if self._job is not None:
+            self._job.cancel()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._baseline = None
+
+    def growth(
+        self, snapshot: Optional[tracemalloc.Snapshot] = None
+    ) -> List[tracemalloc.StatisticDiff]:
+        with self._lock:
+            snapshot = snapshot or self._snapshot()
+            return snapshot.compare_to(self._baseline, "lineno")
+
+    def check(self) -> List[tracemalloc.StatisticDiff]:
+        """Alerts the owners about sites that grew past the threshold, returns them."""
+        grown = []
+        for stat in self.growth():
+            if abs(stat.size_diff) < self.threshold:
+                break  # sorted by absolute size_diff, biggest first
+            if stat.size_diff < 0:
+                continue
+            site = _site(stat)
+            if stat.size_diff - self._alerted.get(site, 0) >= self.threshold:
+                self._alerted[site] = stat.size_diff
+                grown.append(stat)
+        if grown:
+            self.alert(grown)
+        return grown
+
+    def alert(self, grown: List[tracemalloc.StatisticDiff]) -> None:
+        lines = [f"*Memory watch*: {len(grown)} lokasi tumbuh > {_mb(self.threshold)}"]
+        lines.extend(
+            f"+{_mb(stat.size_diff)} ({stat.count_diff:+d} blok) {_site(stat)}"
+            for stat in grown[: self.top]
+        )
+        text = "\n".join(lines)
+        logger.warn(text)
+        me = self.runner.user_info.jid
+        for owner in set(self.runner.owners):
+            if owner == me:
+                continue
+            try:
+                self.runner.relay_message(owner, wa_proto.ExtendedTextMessage(text=text))
+            except Exception as e:
+                logger.error(f"Failed to send memory alert to {owner}: {e}")
+
+    def report(self, limit: Optional[int] = None) -> str:
+        """Top allocation sites by size and by growth since start."""
+        if not self.active:
+            return "Memory watch tidak aktif"
+        limit = limit or self.top
+        current, peak = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        with self._lock:
+            snapshot = self._snapshot()
+        top = snapshot.statistics("lineno")[:limit]
+        growth = self.growth(snapshot)
+        runner = self.runner
+        lines = [
+            "*Memory*",
+            f"Traced: {_mb(current)} (puncak {_mb(peak)})",
+            f"Chats: {len(runner.chats)} chat, "
+            f"{sum(len(chat) for chat in list(runner.chats.values()))} pesan",
+            "",
+            f"*Top {limit} lokasi*",
+        ]
+        lines.extend(f"{_mb(stat.size)} ({stat.count} blok) {_site(stat)}" for stat in top)
+        lines.append("")
+        lines.append(f"*Top {limit} pertumbuhan sejak start*")
+        lines.extend(
+            f"{'+' if stat.size_diff >= 0 else ''}{_mb(stat.size_diff)} "
+            f"({stat.count_diff:+d} blok) {_site(stat)}"
+            for stat in growth[:limit]
+        )
+        lines.append(f"\n{(time.perf_counter() - start) * 1000:.0f}ms")
+        return "\n".join(lines)
@@ -0,0 +1,286 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from luna.utils import logger
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+LabelValues = Tuple[str, ...]
+
+
+class Sample(NamedTuple):
+    name: str
+    labels: Dict[str, str]
+    value: float
+
+
+class MetricFamily(NamedTuple):
+    name: str
+    type: str
+    help: str
+    samples: List[Sample]
+
+
+class _Metric(ABC):
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _labels(self, key: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.label_names, key))
+
+    def collect(self) -> MetricFamily:
+        return MetricFamily(self.name, self.type, self.help, list(self.samples()))
+
+    @abstractmethod
+    def samples(self) -> Iterator[Sample]: ...
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterator[Sample]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield Sample(self.name, self._labels(key), value)
+
+
+class Gauge(_Metric):
+    """A gauge whose value is read from ``func`` at collection time."""
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        func: Callable[[], Dict[LabelValues, float]],
+        labels: Sequence[str] = (),
+    ):
+        super().__init__(name, help, labels)
+        self._func = func
+
+    def samples(self) -> Iterator[Sample]:
+        try:
+            values = self._func()
+        except Exception as e:
+            logger.error(f"Failed to collect {self.name}: {e}")
+            return
+        for key, value in values.items():
+            yield Sample(self.name, self._labels(key), value)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self, size: int):
+        self.buckets = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelValues, _HistogramValue] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            hist = self._values.get(key)
+            if hist is None:
+                hist = self._values[key] = _HistogramValue(len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    hist.buckets[i] += 1
+                    break
+            hist.sum += value
+            hist.count += 1
+
+    @contextmanager
+    def time(self, **labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def summary(self, **labels: str) -> Tuple[int, float]:
+        """Returns the count and the sum of the observations."""
+        hist = self._values.get(self._key(labels))
+        if hist is None:
+            return 0, 0.0
+        return hist.count, hist.sum
+
+    def quantile(self, q: float, **labels: str) -> float:
+        """Upper bound of the bucket holding the ``q`` quantile, inf past the last."""
+        hist = self._values.get(self._key(labels))
+        if hist is None or not hist.count:
+            return 0.0
+        rank = q * hist.count
+        cumulative = 0
+        for bound, bucket in zip(self.buckets, list(hist.buckets)):
+            cumulative += bucket
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def label_values(self) -> List[Dict[str, str]]:
+        with self._lock:
+            return [self._labels(key) for key in self._values]
+
+    def samples(self) -> Iterator[Sample]:
+        with self._lock:
+            values = [
+                (key, list(h.buckets), h.sum, h.count)
+                for key, h in self._values.items()
+            ]
+        for key, buckets, total, count in values:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, buckets):
+                cumulative += bucket
+                yield Sample(
+                    f"{self.name}_bucket", {**labels, "le": _format(bound)}, cumulative
+                )
+            yield Sample(f"{self.name}_bucket", {**labels, "le": "+Inf"}, count)
+            yield Sample(f"{self.name}_sum", labels, total)
+            yield Sample(f"{self.name}_count", labels, count)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric):
+        with self._lock:
+            # re-registering returns the existing metric, command modules reload
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def gauge(
+        self,
+        name: str,
+        help: str,
+        func: Callable[[], Dict[LabelValues, float]],
+        labels: Sequence[str] = (),
+    ) -> Gauge:
+        return self._register(Gauge(name, help, func, labels))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def collect(self) -> List[MetricFamily]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return [metric.collect() for metric in metrics]
+
+    def render(self) -> str:
+        return render(self.collect())
+
+
+def _format(value: float) -> str:
+    return str(value) if isinstance(value, int) else repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render(families: List[MetricFamily]) -> str:
+    """Renders metric families in the Prometheus text exposition format."""
+    lines = []
+    for family in families:
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.type}")
+        for sample in family.samples:
+            if sample.labels:
+                labels = ",".join(
+                    f'{k}="{_escape(v)}"' for k, v in sample.labels.items()
+                )
+                lines.append(f"{sample.name}{{{labels}}} {_format(sample.value)}")
+            else:
+                lines.append(f"{sample.name} {_format(sample.value)}")
+    return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+def start_http_server(
+    port: int,
+    addr: str = "127.0.0.1",
+    collect: Callable[[], str] = metrics.render,
+) -> "ThreadingHTTPServer":
+    """Serves ``/metrics`` on a daemon thread."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = collect().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="metrics-http", daemon=True
+    ).start()
+    logger.info(f"Serving metrics on http://{addr}:{port}/metrics")
+    return server
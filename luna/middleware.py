@@ -0,0 +1,155 @@
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Type, TypeVar
+
+if TYPE_CHECKING:
+    from neonize.events import MessageEv
+    from neonize.proto.Neonize_pb2 import JID
+
+    from luna.core import Runner
+
+MiddlewareT = TypeVar("MiddlewareT", bound="Middleware")
+
+
+def _jid(jid: "JID") -> str:
+    # cheaper than jid_to_str, device and agent are not needed for matching
+    return f"{jid.User}@{jid.Server}"
+
+
+class Middleware:
+    """
+    A stage that runs on the raw ``MessageEv`` before it is serialized.
+
+    Return ``False`` from ``__call__`` to drop the message.
+    """
+
+    name: str = ""
+    # whether a message dropped here still goes to the message store
+    keep_history: bool = True
+
+    def __init_subclass__(cls):
+        cls.name = cls.__name__ if not cls.name else cls.name
+
+    def __call__(self, runner: "Runner", message: "MessageEv") -> bool:
+        return True
+
+
+class BotMessageFilter(Middleware):
+    """Drops messages sent by the bot itself (ids starting with 3EB0)."""
+
+    keep_history = False
+
+    def __call__(self, runner: "Runner", message: "MessageEv") -> bool:
+        return not message.Info.ID.startswith("3EB0")
+
+
+class SelfMessageFilter(Middleware):
+    """Drops every message sent from the bot's own account."""
+
+    def __call__(self, runner: "Runner", message: "MessageEv") -> bool:
+        return not message.Info.MessageSource.IsFromMe
+
+
+class StatusBroadcastFilter(Middleware):
+    keep_history = False
+
+    def __call__(self, runner: "Runner", message: "MessageEv") -> bool:
+        chat = message.Info.MessageSource.Chat
+        return not (chat.User == "status" and chat.Server == "broadcast")
+
+
+class BlockedChatFilter(Middleware):
+    """Drops messages from blocked chats or senders."""
+
+    keep_history = False
+
+    def __init__(self, blocked: Optional[Iterable[str]] = None):
+        self.blocked: Set[str] = set(blocked or ())
+
+    def update(self, blocked: Iterable[str]) -> None:
+        self.blocked = set(blocked)
+
+    def __call__(self, runner: "Runner", message: "MessageEv") -> bool:
+        if not self.blocked:
+            return True
+        source = message.Info.MessageSource
+        return (
+            _jid(source.Chat) not in self.blocked
+            and _jid(source.Sender) not in self.blocked
+        )
+
+
+class StaleMessageFilter(Middleware):
+    """Drops messages older than ``max_age`` seconds, 0 disables it."""
+
+    def __init__(self, max_age: int = 0):
+        self.max_age = max_age
+
+    def __call__(self, runner: "Runner", message: "MessageEv") -> bool:
+        if self.max_age <= 0:
+            return True
+        return time.time() - message.Info.Timestamp <= self.max_age
+
+
+class MiddlewareChain:
+    def __init__(self, middlewares: Optional[Iterable[Middleware]] = None):
+        self._middlewares: List[Middleware] = list(middlewares or ())
+        self._lock = threading.Lock()
+        self.drops: Dict[str, int] = {m.name: 0 for m in self._middlewares}
+        self.passed = 0
+
+    def add(self, middleware: Middleware, index: Optional[int] = None) -> None:
+        with self._lock:
+            middlewares = list(self._middlewares)
+            if index is None:
+                middlewares.append(middleware)
+            else:
+                middlewares.insert(index, middleware)
+            self.drops.setdefault(middleware.name, 0)
+            self._middlewares = middlewares
+
+    def remove(self, name: str) -> None:
+        with self._lock:
+            self._middlewares = [m for m in self._middlewares if m.name != name]
+
+    def get(self, middleware_type: Type[MiddlewareT]) -> Optional[MiddlewareT]:
+        for middleware in self._middlewares:
+            if isinstance(middleware, middleware_type):
+                return middleware
+        return None
+
+    def check(self, runner: "Runner", message: "MessageEv") -> Optional[Middleware]:
+        """
+        Runs every stage, returns the one that dropped the message or None.
+        When that stage keeps history, the later ones that do not still run,
+        so the stage returned tells whether the message may be stored.
+        """
+        middlewares = self._middlewares
+        for i, middleware in enumerate(middlewares):
+            if not middleware(runner, message):
+                self.drops[middleware.name] += 1
+                if middleware.keep_history:
+                    for later in middlewares[i + 1 :]:
+                        if not later.keep_history and not later(runner, message):
+                            return later
+                return middleware
+        self.passed += 1
+        return None
+
+    def process(self, runner: "Runner", message: "MessageEv") -> bool:
+        """Runs every stage, returns False as soon as one drops the message."""
+        return self.check(runner, message) is None
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.drops, "passed": self.passed}
+
+
+def default_chain(max_age: int = 0) -> MiddlewareChain:
+    return MiddlewareChain(
+        [
+            StatusBroadcastFilter(),
+            BotMessageFilter(),
+            BlockedChatFilter(),
+            StaleMessageFilter(max_age),
+        ]
+    )
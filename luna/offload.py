@@ -0,0 +1,251 @@
+import importlib
+import os
+import queue
+import signal
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from luna.supervisor import process_context
+from luna.utils import logger
+from luna.wa_classes import Message, QuotedMessage
+
+if TYPE_CHECKING:
+    from multiprocessing.connection import Connection
+    from multiprocessing.process import BaseProcess
+
+    from luna.command import BaseCommand
+
+# worker side end of the pipe to the parent, set by _worker
+_conn: Optional["Connection"] = None
+
+
+class OffloadTimeout(TimeoutError):
+    pass
+
+
+class OffloadError(RuntimeError):
+    """A command raised in the worker, the message holds the worker traceback."""
+
+
+def _send(kind: str, payload) -> None:
+    if _conn is None:
+        raise RuntimeError("not running in an offload worker")
+    _conn.send((kind, payload))
+
+
+def _reply(text: str) -> None:
+    _send("reply", text)
+
+
+def _reply_quoted(text: str) -> None:
+    _send("reply_quoted", text)
+
+
+def _constant(value):
+    return value
+
+
+class RemoteMessage(Message):
+    """
+    Picklable copy of a :class:`Message` handed to a worker process. It has
+    no ``runner``, replies are sent back to the parent which sends them.
+    """
+
+    def reply_file(self, file, caption: str = "", **kwargs) -> None:
+        _send("file", dict(file=file, caption=caption, **kwargs))
+
+
+def snapshot(m: Message, download: bool = False) -> RemoteMessage:
+    """Copies ``m`` without callables, ``download`` prefetches the media."""
+    media = m.download() if download and m.mimetype else None
+    quoted = None
+    if m.quoted is not None:
+        q = m.quoted
+        quoted = QuotedMessage(
+            id=q.id,
+            sender=q.sender,
+            msg_type=q.msg_type,
+            text=q.text,
+            is_owner=q.is_owner,
+            is_bot=q.is_bot,
+            download=partial(
+                _constant, q.download() if download and q.mimetype else None
+            ),
+            reply=_reply_quoted,
+            mimetype=q.mimetype,
+        )
+    return RemoteMessage(
+        id=m.id,
+        text=m.text,
+        sender=m.sender,
+        chat=m.chat,
+        is_group=m.is_group,
+        is_from_me=m.is_from_me,
+        msg_type=m.msg_type,
+        is_owner=m.is_owner,
+        is_bot=m.is_bot,
+        runner=None,  # type: ignore
+        push_name=m.push_name,
+        _message=m._message,
+        download=partial(_constant, media),
+        mimetype=m.mimetype,
+        group_metadata=partial(
+            _constant, m.group_metadata() if m.is_group else None
+        ),
+        reply=_reply,
+        quoted=quoted,
+        mentioned_jid=list(m.mentioned_jid),
+        args=list(m.args),
+        body=m.body,
+        command=m.command,
+        used_prefix=m.used_prefix,
+    )
+
+
+def _worker(conn: "Connection") -> None:
+    global _conn
+    _conn = conn
+    # the parent handles Ctrl+C and terminates the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    commands: Dict[Tuple[str, str], Tuple[float, "BaseCommand"]] = {}
+    while True:
+        try:
+            module_name, class_name, mtime, message = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            cached = commands.get((module_name, class_name))
+            if cached is None or cached[0] != mtime:
+                module = importlib.import_module(module_name)
+                if cached is not None:
+                    # edited since this worker imported it, like FileReloader
+                    module = importlib.reload(module)
+                cached = commands[(module_name, class_name)] = (
+                    mtime,
+                    getattr(module, class_name)(),
+                )
+            cached[1].execute(message)
+        except Exception:
+            conn.send(("error", traceback.format_exc()))
+        else:
+            conn.send(("done", None))
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.process: "BaseProcess" = ctx.Process(
+            target=_worker, args=(child,), name="luna-offload", daemon=True
+        )
+        self.process.start()
+        child.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+
+class ProcessOffloader:
+    """
+    Runs ``execute`` of commands with ``run_in_process`` in a small pool of
+    worker processes, so CPU-bound commands do not hold the GIL.
+
+    Workers are started on first use. A worker that exceeds the command's
+    ``process_timeout`` is killed and replaced.
+
+    :meth:`submit` waits for the worker on one of ``workers`` threads, so the
+    dispatching thread is free again as soon as the job is handed over.
+    """
+
+    def __init__(self, workers: int = 2):
+        self.size = workers
+        self._ctx = process_context()
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="offload")
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> _Worker:
+        while True:
+            with self._lock:
+                if self._idle.empty() and len(self._workers) < self.size:
+                    worker = _Worker(self._ctx)
+                    self._workers.append(worker)
+                    return worker
+            try:
+                # a killed worker is never put back, so look again for room
+                return self._idle.get(timeout=1)
+            except queue.Empty:
+                continue
+
+    def _discard(self, worker: _Worker) -> None:
+        worker.kill()
+        with self._lock:
+            self._workers.remove(worker)
+
+    def submit(self, m: Message, command: "BaseCommand") -> "Future[None]":
+        """Runs ``command`` for ``m`` in a worker, the future fails like :meth:`run`."""
+        return self._executor.submit(self.run, m, command)
+
+    def run(self, m: Message, command: "BaseCommand") -> None:
+        """Runs ``command`` for ``m`` in a worker and waits for it to finish."""
+        cls = type(command)
+        module = importlib.import_module(cls.__module__)
+        try:
+            mtime = os.path.getmtime(module.__file__ or "")
+        except OSError:
+            mtime = 0.0
+        message = snapshot(m, download=command.process_download)
+
+        worker = self._acquire()
+        # only a worker that reported back can take the next job
+        finished = False
+        try:
+            worker.conn.send((cls.__module__, cls.__qualname__, mtime, message))
+            deadline = time.monotonic() + command.process_timeout
+            while (remaining := deadline - time.monotonic()) > 0:
+                if not worker.conn.poll(remaining):
+                    continue
+                kind, payload = worker.conn.recv()
+                if kind == "done":
+                    finished = True
+                    return
+                if kind == "error":
+                    finished = True
+                    raise OffloadError(payload)
+                self._route(m, kind, payload)
+            raise OffloadTimeout(
+                f"{command.name} did not finish in {command.process_timeout}s"
+            )
+        except OffloadTimeout:
+            raise
+        except (EOFError, OSError) as e:
+            raise OffloadError(f"Worker for {command.name} died: {e}") from None
+        finally:
+            if finished:
+                self._idle.put(worker)
+            else:
+                self._discard(worker)
+
+    @staticmethod
+    def _route(m: Message, kind: str, payload) -> None:
+        if kind == "reply":
+            m.reply(payload)
+        elif kind == "reply_quoted" and m.quoted is not None:
+            m.quoted.reply(payload)
+        elif kind == "file":
+            m.reply_file(**payload)
+        else:
+            logger.warn(f"Unknown offload message {kind}")
+
+    def stop(self) -> None:
+        self._executor.shutdown(wait=False)
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.kill()
@@ -0,0 +1,230 @@
+import io
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Set
+
+from luna.utils import logger
+
+if TYPE_CHECKING:
+    import pstats
+
+MODES = ("sampling", "cprofile")
+
+
+@dataclass
+class ProfileResult:
+    mode: str
+    command: Optional[str]
+    duration: float
+    messages: int
+    top: str
+    collapsed: str
+
+
+@dataclass
+class _Session:
+    mode: str
+    command: Optional[str]
+    max_messages: Optional[int]
+    on_done: Optional[Callable[[ProfileResult], None]]
+    interval: float
+    started_at: float = field(default_factory=time.monotonic)
+    messages: int = 0
+    stats: Optional["pstats.Stats"] = None
+    samples: Counter = field(default_factory=Counter)
+    threads: Set[int] = field(default_factory=set)
+    timer: Optional[threading.Timer] = None
+    sampler: Optional[threading.Thread] = None
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _func_name(func) -> str:
+    filename, line, name = func
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+class Profiler:
+    """
+    Captures profiles around CommandHandler.handle for a limited time or a
+    limited number of messages.
+
+    ``sampling`` walks the stacks of the handling threads every ``interval``
+    seconds and is cheap enough for production. ``cprofile`` traces every
+    call and gives exact counts at a higher cost.
+    """
+
+    def __init__(self):
+        self._session: Optional[_Session] = None
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self._session is not None
+
+    def start(
+        self,
+        mode: str = "sampling",
+        seconds: Optional[float] = None,
+        messages: Optional[int] = None,
+        command: Optional[str] = None,
+        on_done: Optional[Callable[[ProfileResult], None]] = None,
+        interval: float = 0.005,
+    ) -> None:
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiler mode {mode}, use one of {MODES}")
+        with self._lock:
+            if self._session is not None:
+                raise RuntimeError("A profile is already running")
+            session = _Session(mode, command, messages, on_done, interval)
+            if seconds:
+                session.timer = threading.Timer(seconds, self.stop)
+                session.timer.daemon = True
+                session.timer.start()
+            self._session = session
+            if mode == "sampling":
+                session.sampler = threading.Thread(
+                    target=self._sample, args=(session,), name="profiler", daemon=True
+                )
+                session.sampler.start()
+        logger.info(f"Profiler started ({mode}, command={command})")
+
+    def stop(self) -> Optional[ProfileResult]:
+        with self._lock:
+            session, self._session = self._session, None
+        if session is None:
+            return None
+        if session.timer is not None:
+            session.timer.cancel()
+        if session.sampler is not None:
+            session.sampler.join()
+
+        result = self._result(session)
+        logger.info(f"Profiler stopped after {result.messages} messages")
+        if session.on_done is not None:
+            try:
+                session.on_done(result)
+            except Exception as e:
+                logger.error(f"Error delivering profile: {e}")
+        return result
+
+    @contextmanager
+    def capture(self, command: Optional[str] = None):
+        """
+        Profiles the wrapped block if a session is running for ``command``.
+        ``None`` marks the whole dispatch, a name marks one command.
+        """
+        session = self._session
+        if session is None or session.command != command:
+            yield
+            return
+
+        if session.mode == "cprofile":
+            import cProfile
+            import pstats
+
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+                with self._lock:
+                    if session.stats is None:
+                        session.stats = pstats.Stats(profile)
+                    else:
+                        session.stats.add(profile)
+        else:
+            ident = threading.get_ident()
+            session.threads.add(ident)
+            try:
+                yield
+            finally:
+                session.threads.discard(ident)
+
+        with self._lock:
+            session.messages += 1
+            done = (
+                session.max_messages is not None
+                and session.messages >= session.max_messages
+                and self._session is session
+            )
+        if done:
+            self.stop()
+
+    def _sample(self, session: _Session) -> None:
+        while self._session is session:
+            frames = sys._current_frames()
+            for ident in list(session.threads):
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame.f_code))
+                    frame = frame.f_back
+                if stack:
+                    session.samples[";".join(reversed(stack))] += 1
+            time.sleep(session.interval)
+
+    def _result(self, session: _Session) -> ProfileResult:
+        duration = time.monotonic() - session.started_at
+        if session.mode == "cprofile":
+            top, collapsed = self._cprofile_report(session.stats)
+        else:
+            top, collapsed = self._sampling_report(session.samples)
+        return ProfileResult(
+            session.mode, session.command, duration, session.messages, top, collapsed
+        )
+
+    @staticmethod
+    def _sampling_report(samples: Counter, limit: int = 20):
+        total = sum(samples.values())
+        if not total:
+            return "no samples captured", ""
+        own: Dict[str, int] = Counter()
+        cumulative: Dict[str, int] = Counter()
+        for stack, count in samples.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for name in set(frames):
+                cumulative[name] += count
+
+        lines = [f"{total} samples", "own%   cum%   function"]
+        for name, count in sorted(own.items(), key=lambda i: -i[1])[:limit]:
+            lines.append(
+                f"{count * 100 / total:5.1f}  {cumulative[name] * 100 / total:5.1f}  {name}"
+            )
+        collapsed = "\n".join(f"{stack} {count}" for stack, count in samples.items())
+        return "\n".join(lines), collapsed
+
+    @staticmethod
+    def _cprofile_report(stats: Optional["pstats.Stats"], limit: int = 20):
+        if stats is None:
+            return "no calls captured", ""
+        import pstats
+
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+
+        # cProfile only knows caller/callee pairs, so every stack is two deep,
+        # weighted by the callee's own time in microseconds
+        lines = []
+        for func, (_, _, tt, _, callers) in stats.stats.items():  # type: ignore
+            name = _func_name(func)
+            if not callers:
+                lines.append(f"{name} {int(tt * 1e6)}")
+            for caller, caller_stats in callers.items():
+                lines.append(
+                    f"{_func_name(caller)};{name} {int(caller_stats[2] * 1e6)}"
+                )
+        return out.getvalue(), "\n".join(lines)
+
+
+profiler = Profiler()
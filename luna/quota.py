@@ -0,0 +1,179 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set
+
+from luna.utils import logger
+
+if TYPE_CHECKING:
+    from luna.scheduler import Job, Scheduler
+
+
+class QuotaManager:
+    """
+    Sliding window usage counters for commands with ``limit_usage``.
+
+    Each counter keeps only the current and the previous fixed window, the
+    previous one weighted by how much of it still overlaps the sliding
+    window, so a check is O(1) and a counter is three integers.
+
+    With ``path`` counters and the premium set are loaded from SQLite on
+    startup. Once :meth:`start` is called, changed counters are written back
+    every ``flush_interval`` seconds in one transaction, not on every use.
+    """
+
+    _schema = """
+        CREATE TABLE IF NOT EXISTS quota (
+            key TEXT PRIMARY KEY,
+            window INTEGER NOT NULL,
+            previous INTEGER NOT NULL,
+            current INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS premium (jid TEXT PRIMARY KEY);
+    """
+
+    def __init__(
+        self,
+        path: str = "",
+        window: float = 86400,
+        premium: Iterable[str] = (),
+        flush_interval: float = 5,
+    ):
+        self.path = path
+        self.window = window
+        self.flush_interval = flush_interval
+        # key -> [window index, previous count, current count]
+        self._counters: Dict[str, List[int]] = {}
+        self._dirty: Set[str] = set()
+        self._premium: Set[str] = set(premium)
+        self._lock = threading.Lock()
+        self._job: Optional["Job"] = None
+        if path:
+            self._load()
+
+    def _index(self, now: float) -> int:
+        return int(now // self.window)
+
+    def _roll(self, counter: List[int], index: int) -> None:
+        if counter[0] == index:
+            return
+        counter[1] = counter[2] if counter[0] == index - 1 else 0
+        counter[2] = 0
+        counter[0] = index
+
+    def _estimate(self, counter: List[int], now: float) -> float:
+        overlap = 1 - (now % self.window) / self.window
+        return counter[1] * overlap + counter[2]
+
+    def acquire(self, key: str, limit: int) -> bool:
+        """Counts one use of ``key`` unless it already reached ``limit``."""
+        now = time.time()
+        index = self._index(now)
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = [index, 0, 0]
+            self._roll(counter, index)
+            if self._estimate(counter, now) >= limit:
+                return False
+            counter[2] += 1
+            self._dirty.add(key)
+        return True
+
+    def remaining(self, key: str, limit: int) -> int:
+        now = time.time()
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                return limit
+            self._roll(counter, self._index(now))
+            return max(0, limit - int(self._estimate(counter, now) + 0.5))
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            if self._counters.pop(key, None) is not None:
+                self._dirty.add(key)
+
+    def is_premium(self, jid: str) -> bool:
+        return jid in self._premium
+
+    def add_premium(self, jid: str) -> None:
+        self._premium.add(jid)
+        self._write_premium("INSERT OR IGNORE INTO premium VALUES (?)", jid)
+
+    def remove_premium(self, jid: str) -> None:
+        self._premium.discard(jid)
+        self._write_premium("DELETE FROM premium WHERE jid = ?", jid)
+
+    @property
+    def premium(self) -> Set[str]:
+        return set(self._premium)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _write_premium(self, sql: str, jid: str) -> None:
+        if not self.path:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(sql, (jid,))
+        except sqlite3.Error as e:
+            logger.error(f"Failed to update premium users: {e}")
+
+    def _load(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        oldest = self._index(time.time()) - 1
+        try:
+            with self._connect() as conn:
+                conn.executescript(self._schema)
+                rows = conn.execute(
+                    "SELECT key, window, previous, current FROM quota WHERE window >= ?",
+                    (oldest,),
+                ).fetchall()
+                premium = conn.execute("SELECT jid FROM premium").fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to load quotas from {self.path}: {e}")
+            return
+        self._counters = {row[0]: list(row[1:]) for row in rows}
+        self._premium.update(jid for jid, in premium)
+
+    def flush(self) -> None:
+        """Writes the counters changed since the last flush and prunes stale ones."""
+        oldest = self._index(time.time()) - 1
+        with self._lock:
+            changed = [(key, self._counters.get(key)) for key in self._dirty]
+            self._dirty.clear()
+            stale = [key for key, c in self._counters.items() if c[0] < oldest]
+            for key in stale:
+                del self._counters[key]
+        if not self.path or not (changed or stale):
+            return
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO quota VALUES (?, ?, ?, ?)",
+                    [(key, *counter) for key, counter in changed if counter is not None],
+                )
+                conn.executemany(
+                    "DELETE FROM quota WHERE key = ?",
+                    [(key,) for key, counter in changed if counter is None],
+                )
+                conn.execute("DELETE FROM quota WHERE window < ?", (oldest,))
+        except sqlite3.Error as e:
+            logger.error(f"Failed to persist quotas to {self.path}: {e}")
+            with self._lock:
+                self._dirty.update(key for key, _ in changed)
+
+    def start(self, scheduler: "Scheduler") -> None:
+        if not self.path or self._job is not None:
+            return
+        self._job = scheduler.every(self.flush_interval, self.flush, name="quota")
+
+    def close(self) -> None:
+        if self._job is not None:
+            self._job.cancel()
+        self.flush()
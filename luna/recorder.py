@@ -0,0 +1,58 @@
+import os
+import struct
+import threading
+import time
+from typing import TYPE_CHECKING, BinaryIO, Iterator, Tuple
+
+if TYPE_CHECKING:
+    from neonize.events import MessageEv
+
+MAGIC = b"LUNAEV1\n"
+# arrival time (unix seconds, float64) and payload length (uint32)
+RECORD_HEADER = struct.Struct("<dI")
+
+
+class EventRecorder:
+    """
+    Appends raw ``MessageEv`` protobuf bytes with their arrival time to a
+    length-prefixed log that :func:`read_events` can read back.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file: BinaryIO = open(path, "ab")
+        if new_file:
+            self._file.write(MAGIC)
+        self.count = 0
+
+    def record(self, message: "MessageEv") -> None:
+        data = message.SerializeToString()
+        header = RECORD_HEADER.pack(time.time(), len(data))
+        with self._lock:
+            self._file.write(header + data)
+            self.count += 1
+
+    def flush(self) -> None:
+        with self._lock:
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def read_events(path: str) -> Iterator[Tuple[float, bytes]]:
+    """Yields ``(arrival_time, message_bytes)`` pairs from a recorded log."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a recorded event log")
+        while header := f.read(RECORD_HEADER.size):
+            if len(header) < RECORD_HEADER.size:
+                break  # truncated by a crash while recording
+            arrival, size = RECORD_HEADER.unpack(header)
+            data = f.read(size)
+            if len(data) < size:
+                break
+            yield arrival, data
@@ -0,0 +1,142 @@
+import threading
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from cachetools import TTLCache
+from neonize.proto import def_pb2 as wa_proto
+
+if TYPE_CHECKING:
+    from luna.wa_classes import Message
+
+# (method on Message, args, kwargs), or ("relay", (sent message,), {})
+ReplyAction = Tuple[str, tuple, dict]
+# context info fields tying a sent message to the message it replied to
+QUOTE_FIELDS = ("stanzaId", "participant", "quotedMessage", "remoteJid")
+
+
+def _unquoted(message: wa_proto.Message) -> wa_proto.Message:
+    """Copy of a sent message without the quote of the message it replied to."""
+    copy = wa_proto.Message()
+    copy.CopyFrom(message)
+    for _, part in copy.ListFields():
+        if "contextInfo" in part.DESCRIPTOR.fields_by_name and part.HasField(
+            "contextInfo"
+        ):
+            for name in QUOTE_FIELDS:
+                part.contextInfo.ClearField(name)
+    return copy
+
+
+class ReplyRecorder:
+    """
+    Swaps ``m.reply`` and ``m.reply_file`` for wrappers that still send and
+    also remember what was sent, so it can be sent again for a cache hit.
+
+    A file is remembered as the media message that was sent, which points at
+    the upload, so a hit neither downloads nor uploads it again nor keeps the
+    file in memory.
+    """
+
+    def __init__(self, m: "Message"):
+        self.m = m
+        self.actions: List[ReplyAction] = []
+        self._reply = m.reply
+
+    def __enter__(self) -> "ReplyRecorder":
+        self.m.reply = self.reply
+        self.m.reply_file = self.reply_file
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.m.reply = self._reply
+        del self.m.reply_file  # back to the method
+
+    def reply(self, text: str):
+        self.actions.append(("reply", (text,), {}))
+        return self._reply(text)
+
+    def reply_file(self, file, caption: str = "", **kwargs):
+        with self.m.runner.capture_sent() as sent:
+            response = type(self.m).reply_file(self.m, file, caption, **kwargs)
+        if sent:
+            self.actions.append(("relay", (_unquoted(sent[-1]),), {}))
+        else:
+            self.actions.append(("reply_file", (file, caption), kwargs))
+        return response
+
+
+def replay(m: "Message", actions: List[ReplyAction]) -> None:
+    for method, args, kwargs in actions:
+        if method == "relay":
+            # relay_message adds the quote in place, the cached one stays clean
+            message = wa_proto.Message()
+            message.CopyFrom(args[0])
+            m.runner.relay_message(m.chat, message, quoted=m)
+        else:
+            getattr(m, method)(*args, **kwargs)
+
+
+@dataclass
+class _Flight:
+    done: threading.Event = field(default_factory=threading.Event)
+    actions: Optional[List[ReplyAction]] = None
+
+
+class ReplyCache:
+    """
+    Replies of one command by cache key, dropped after ``ttl`` seconds or
+    least recently used once ``maxsize`` keys are cached.
+
+    Concurrent misses for the same key are single-flight: the first caller
+    runs the command and the others wait for its replies.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, wait_timeout: float = 60):
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.wait_timeout = wait_timeout
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._cache)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def get_or_run(
+        self, key: str, run: Callable[[], List[ReplyAction]]
+    ) -> Tuple[Optional[List[ReplyAction]], str]:
+        """
+        Returns the cached replies and ``"hit"``, the replies of another
+        caller running the same key and ``"shared"``, or runs ``run`` itself
+        and returns its replies with ``"miss"``.
+        """
+        with self._lock:
+            actions = self._cache.get(key)
+            if actions is not None:
+                return actions, "hit"
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if flight.done.wait(self.wait_timeout) and flight.actions is not None:
+                return flight.actions, "shared"
+            # the leader failed or is too slow, run it here
+            return run(), "miss"
+
+        try:
+            actions = run()
+            flight.actions = actions
+            if actions:
+                with self._lock:
+                    self._cache[key] = actions
+            return actions, "miss"
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
@@ -0,0 +1,272 @@
+import heapq
+import itertools
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from luna.metrics import metrics
+from luna.utils import logger
+
+SCHEDULED_RUNS = metrics.counter(
+    "luna_scheduled_runs_total", "Scheduled job runs by result", ["job", "result"]
+)
+
+
+@dataclass(eq=False)
+class Job:
+    name: str
+    func: Callable[..., Any]
+    args: tuple = ()
+    kwargs: dict = field(default_factory=dict)
+    # wall clock time of the next run
+    at: float = 0.0
+    # seconds between the end of a run and the next one, 0 runs once
+    interval: float = 0.0
+    # up to this many seconds added to every run time
+    jitter: float = 0.0
+    # row id and payload of a persisted job
+    persisted: Optional[int] = None
+    payload: Optional[Dict[str, Any]] = None
+    cancelled: bool = False
+    running: bool = False
+    # failed runs in a row of a persisted job
+    failures: int = 0
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class Scheduler:
+    """
+    Runs one-shot and periodic jobs from a single timer thread.
+
+    Jobs wait in a heap ordered by run time; the thread sleeps until the
+    earliest one is due and hands its body to ``executor``, so any number of
+    jobs costs one thread. A periodic job is scheduled again once its run
+    ended, so runs of the same job never overlap.
+
+    With ``path``, jobs added through :meth:`persist` are kept in SQLite and
+    scheduled again by :meth:`load`, to the handler registered for their kind
+    with :meth:`handle`. Those missed while the bot was down run right away.
+    A persisted job whose handler raises stays in SQLite and is tried again
+    after ``retry_delay`` seconds, doubled on each failure up to
+    ``max_retry_delay``.
+    """
+
+    retry_delay = 30
+    max_retry_delay = 600
+
+    _schema = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            at REAL NOT NULL,
+            payload TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, executor: Executor, path: str = ""):
+        self.executor = executor
+        self.path = path
+        self._heap: List[Tuple[float, int, Job]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self._loaded = False
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with self._connect() as conn:
+                conn.executescript(self._schema)
+
+    def __len__(self) -> int:
+        with self._cond:
+            return sum(1 for _, _, job in self._heap if not job.cancelled)
+
+    def jobs(self) -> List[Job]:
+        with self._cond:
+            return sorted(
+                (job for _, _, job in self._heap if not job.cancelled),
+                key=lambda job: job.at,
+            )
+
+    def _push(self, job: Job, at: float) -> Job:
+        job.at = at + (random.uniform(0, job.jitter) if job.jitter else 0)
+        with self._cond:
+            heapq.heappush(self._heap, (job.at, next(self._seq), job))
+            if self._heap[0][2] is job:
+                self._cond.notify()
+        return job
+
+    def call_at(
+        self,
+        at: float,
+        func: Callable,
+        *args,
+        name: str = "",
+        jitter: float = 0,
+        **kwargs,
+    ) -> Job:
+        """Runs ``func(*args, **kwargs)`` once at the wall clock time ``at``."""
+        job = Job(name or func.__name__, func, args, kwargs, jitter=jitter)
+        return self._push(job, at)
+
+    def call_later(
+        self,
+        delay: float,
+        func: Callable,
+        *args,
+        name: str = "",
+        jitter: float = 0,
+        **kwargs,
+    ) -> Job:
+        job = Job(name or func.__name__, func, args, kwargs, jitter=jitter)
+        return self._push(job, time.time() + delay)
+
+    def every(
+        self,
+        interval: float,
+        func: Callable,
+        *args,
+        name: str = "",
+        jitter: float = 0,
+        first_delay: Optional[float] = None,
+        **kwargs,
+    ) -> Job:
+        """Runs ``func`` every ``interval`` seconds, first after ``first_delay``."""
+        job = Job(
+            name or func.__name__, func, args, kwargs, interval=interval, jitter=jitter
+        )
+        delay = interval if first_delay is None else first_delay
+        return self._push(job, time.time() + delay)
+
+    def handle(self, kind: str, handler: Callable[[Dict[str, Any]], Any]) -> None:
+        """Sets the function persisted jobs of ``kind`` are run with."""
+        self._handlers[kind] = handler
+
+    def persist(self, kind: str, at: float, payload: Dict[str, Any]) -> Job:
+        """Schedules a job surviving restarts, run as ``handler(payload)`` at ``at``."""
+        if not self.path:
+            raise RuntimeError("Scheduler has no path to persist jobs to")
+        with self._connect() as conn:
+            row_id = conn.execute(
+                "INSERT INTO jobs (kind, at, payload) VALUES (?, ?, ?)",
+                (kind, at, json.dumps(payload)),
+            ).lastrowid
+        return self._push(self._persisted_job(row_id, kind, payload), at)
+
+    def cancel(self, job: Job) -> None:
+        job.cancel()
+        if job.persisted is not None:
+            self._delete(job.persisted)
+
+    def _persisted_job(self, row_id: int, kind: str, payload: Dict[str, Any]) -> Job:
+        def run():
+            handler = self._handlers.get(kind)
+            if handler is None:
+                raise LookupError(f"No handler for scheduled {kind}")
+            # kept when the handler raises, to be tried again
+            handler(payload)
+            self._delete(row_id)
+
+        return Job(kind, run, persisted=row_id, payload=payload)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _delete(self, row_id: int) -> None:
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM jobs WHERE id = ?", (row_id,))
+        except sqlite3.Error as e:
+            logger.error(f"Failed to delete scheduled job {row_id}: {e}")
+
+    def load(self) -> None:
+        """Schedules the persisted jobs, once."""
+        if not self.path or self._loaded:
+            return
+        self._loaded = True
+        try:
+            with self._connect() as conn:
+                rows = conn.execute("SELECT id, kind, at, payload FROM jobs").fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to load scheduled jobs from {self.path}: {e}")
+            return
+        with self._cond:
+            scheduled = {job.persisted for _, _, job in self._heap}
+        rows = [row for row in rows if row[0] not in scheduled]
+        for row_id, kind, at, payload in rows:
+            self._push(self._persisted_job(row_id, kind, json.loads(payload)), at)
+        if rows:
+            logger.info(f"Loaded {len(rows)} scheduled jobs")
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    at, _, job = self._heap[0]
+                    if job.cancelled:
+                        heapq.heappop(self._heap)
+                        continue
+                    delay = at - time.time()
+                    if delay <= 0:
+                        heapq.heappop(self._heap)
+                        break
+                    self._cond.wait(delay)
+                if self._stopped:
+                    return
+            self._submit(job)
+
+    def _submit(self, job: Job) -> None:
+        job.running = True
+        try:
+            self.executor.submit(self._execute, job)
+        except RuntimeError:
+            # the executor is shutting down
+            job.running = False
+
+    def _execute(self, job: Job) -> None:
+        retry = None
+        try:
+            job.func(*job.args, **job.kwargs)
+            SCHEDULED_RUNS.inc(job=job.name, result="ok")
+        except Exception as e:
+            SCHEDULED_RUNS.inc(job=job.name, result="error")
+            if job.persisted is not None:
+                retry = min(self.retry_delay * 2**job.failures, self.max_retry_delay)
+                job.failures += 1
+                logger.error(f"Scheduled job {job.name} failed, retry in {retry}s: {e}")
+            else:
+                logger.error(f"Scheduled job {job.name} failed: {e}")
+        finally:
+            job.running = False
+            if job.cancelled or self._stopped:
+                pass
+            elif retry is not None:
+                self._push(job, time.time() + retry)
+            elif job.interval:
+                self._push(job, time.time() + job.interval)
+
+    def stop(self) -> None:
+        """Stops the timer thread, persisted jobs run on the next start."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(1)
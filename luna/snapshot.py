@@ -0,0 +1,186 @@
+import os
+import pickle
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from luna.utils import logger
+
+if TYPE_CHECKING:
+    from luna import Runner
+    from luna.scheduler import Job, Scheduler
+
+SNAPSHOT_VERSION = 1
+
+
+@dataclass
+class Snapshot:
+    saved_at: float
+    groups: Dict[str, object] = field(default_factory=dict)
+    contacts: Dict[str, object] = field(default_factory=dict)
+    # command module path -> mtime of the file when it was imported
+    commands: Dict[str, float] = field(default_factory=dict)
+    version: int = SNAPSHOT_VERSION
+
+
+class SnapshotManager:
+    """
+    Saves the runner's group metadata and contact caches plus the command
+    manifest to ``path`` so a restart does not begin with cold caches.
+
+    Loaded entries are served immediately and refetched by :meth:`revalidate`
+    once the client is connected, one group every ``revalidate_delay``
+    seconds by scheduler jobs. Entries left when the connection drops are
+    refetched on the next :meth:`revalidate`.
+    """
+
+    def __init__(
+        self,
+        runner: "Runner",
+        path: str,
+        interval: int = 300,
+        max_age: int = 86400,
+        revalidate_delay: float = 0.2,
+    ):
+        self.runner = runner
+        self.path = path
+        self.interval = interval
+        self.max_age = max_age
+        self.revalidate_delay = revalidate_delay
+        self._pending = set()
+        self._stop = threading.Event()
+        self._job: Optional["Job"] = None
+        self._scheduler: Optional["Scheduler"] = None
+        self._revalidating = False
+
+    def take(self) -> Snapshot:
+        runner = self.runner
+        groups = dict(runner.group_cache.items())
+        contacts = dict(runner.contact_cache.items())
+        commands = {}
+        for path, _ in list(runner.command_handler.get_commands()):
+            try:
+                commands[str(path)] = os.path.getmtime(path)
+            except OSError:
+                continue
+        return Snapshot(time.time(), groups, contacts, commands)
+
+    def save(self) -> None:
+        snapshot = self.take()
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.error(f"Failed to save snapshot {self.path}: {e}")
+            return
+        logger.debug(
+            f"Saved snapshot with {len(snapshot.groups)} groups, "
+            f"{len(snapshot.contacts)} contacts"
+        )
+
+    def read(self) -> Optional[Snapshot]:
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                snapshot = pickle.load(f)
+        except Exception as e:
+            logger.warn(f"Ignoring unreadable snapshot {self.path}: {e}")
+            return None
+        if not isinstance(snapshot, Snapshot) or snapshot.version != SNAPSHOT_VERSION:
+            logger.warn(f"Ignoring snapshot {self.path} from another version")
+            return None
+        age = time.time() - snapshot.saved_at
+        if self.max_age and age > self.max_age:
+            logger.info(f"Snapshot is {age:.0f}s old, starting cold")
+            return None
+        return snapshot
+
+    def load(self) -> bool:
+        """Fills the runner caches from the snapshot, returns whether it was used."""
+        snapshot = self.read()
+        if snapshot is None:
+            return False
+        runner = self.runner
+        # never replaces what another session fetched after the snapshot
+        runner.group_cache.update(snapshot.groups, at=snapshot.saved_at)
+        runner.contact_cache.update(snapshot.contacts, at=snapshot.saved_at)
+        self._pending = {("group", jid) for jid in snapshot.groups}
+        self._pending.update(("contact", jid) for jid in snapshot.contacts)
+
+        changed = [
+            path
+            for path, mtime in snapshot.commands.items()
+            if not os.path.exists(path) or os.path.getmtime(path) != mtime
+        ]
+        if changed:
+            logger.info(f"Commands changed since the snapshot: {', '.join(changed)}")
+        logger.info(
+            f"Warm start from snapshot ({time.time() - snapshot.saved_at:.0f}s old): "
+            f"{len(snapshot.groups)} groups, {len(snapshot.contacts)} contacts"
+        )
+        return True
+
+    def revalidate(self) -> None:
+        """Refetches every entry that came from the snapshot in the background."""
+        if not self._pending or self._scheduler is None or self._revalidating:
+            return
+        self._revalidating = True
+        # popped from the end, so contacts first, then groups, each sorted
+        queue = sorted(self._pending, reverse=True)
+        self._pending = set()
+        self._scheduler.call_later(
+            0, self._revalidate, queue, 0, 0, name="snapshot_revalidate"
+        )
+
+    def _revalidate(self, queue: List[Tuple[str, str]], refreshed: int, failed: int):
+        runner = self.runner
+        while queue:
+            if self._stop.is_set() or not runner.is_connected:
+                self._pending.update(queue)
+                self._revalidating = False
+                logger.info(
+                    f"Revalidation stopped, {len(queue)} snapshot entries left"
+                )
+                return
+            kind, jid = queue.pop()
+            cache = runner.group_cache if kind == "group" else runner.contact_cache
+            cache.delete(jid)
+            try:
+                if kind == "group":
+                    runner.group_metadata(jid)
+                else:
+                    runner.get_contact(jid)
+                refreshed += 1
+            except Exception as e:
+                failed += 1
+                logger.debug(f"Dropped stale {kind} {jid}: {e}")
+            if kind == "group" and queue and self._scheduler is not None:
+                # the next group in its own job, so no thread sleeps meanwhile
+                self._scheduler.call_later(
+                    self.revalidate_delay,
+                    self._revalidate,
+                    queue,
+                    refreshed,
+                    failed,
+                    name="snapshot_revalidate",
+                )
+                return
+        self._revalidating = False
+        logger.info(f"Revalidated {refreshed} snapshot entries, {failed} dropped")
+
+    def start(self, scheduler: "Scheduler") -> None:
+        """Saves every ``interval`` seconds until :meth:`stop`."""
+        self._scheduler = scheduler
+        if self.interval <= 0 or self._job is not None:
+            return
+        self._job = scheduler.every(self.interval, self.save, name="snapshot")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._job is not None:
+            self._job.cancel()
+        self.save()
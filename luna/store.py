@@ -0,0 +1,329 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterator, List, NamedTuple, Optional, Sequence, Union
+
+from luna.utils import get_text, logger
+
+if TYPE_CHECKING:
+    from neonize.events import MessageEv
+
+    from luna import Runner
+    from luna.scheduler import Job, Scheduler
+    from neonize.proto.def_pb2 import HistorySync
+    from neonize.proto.Neonize_pb2 import JID
+
+
+class StoredMessage(NamedTuple):
+    chat: str
+    id: str
+    sender: str
+    timestamp: int
+    from_me: bool
+    msg_type: str
+    text: str
+
+
+def _jid(jid: "JID") -> str:
+    return f"{jid.User}@{jid.Server}"
+
+
+class SearchResult(NamedTuple):
+    chat: str
+    id: str
+    sender: str
+    timestamp: int
+    msg_type: str
+    text: str
+    # matched words wrapped in *bold*, cut around the match
+    snippet: str
+    # bm25, lower is better
+    rank: float
+
+
+@dataclass
+class SearchPage:
+    results: List[SearchResult]
+    total: int
+    offset: int
+    limit: int
+
+    @property
+    def has_more(self) -> bool:
+        return self.offset + len(self.results) < self.total
+
+
+def fts_query(text: str) -> str:
+    """Turns user input into an FTS5 query matching all its words, as prefixes."""
+    words = [word.replace('"', '""') for word in text.split()]
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def from_event(runner: "Runner", message: "MessageEv") -> StoredMessage:
+    """Builds a row straight from the protobuf, without ``MessageSerialize``."""
+    source = message.Info.MessageSource
+    return StoredMessage(
+        chat=_jid(source.Chat),
+        id=message.Info.ID,
+        sender=_jid(source.Sender),
+        timestamp=message.Info.Timestamp,
+        from_me=source.IsFromMe,
+        msg_type=runner.get_message_type(message.Message),
+        text=get_text(message.Message),
+    )
+
+
+def from_history(runner: "Runner", history: "HistorySync") -> Iterator[StoredMessage]:
+    me = _jid(runner.get_me().JID)
+    for conversation in history.conversations:
+        for item in conversation.messages:
+            info = item.message
+            if not info.HasField("message"):
+                continue  # stubs like "joined using invite link"
+            key = info.key
+            yield StoredMessage(
+                chat=conversation.id,
+                id=key.id,
+                sender=(
+                    me
+                    if key.fromMe
+                    else key.participant or info.participant or conversation.id
+                ),
+                timestamp=info.messageTimestamp,
+                from_me=key.fromMe,
+                msg_type=runner.get_message_type(info.message),
+                text=get_text(info.message),
+            )
+
+
+class MessageStore:
+    """
+    SQLite message store. Writes are queued and a single writer thread
+    commits them in batches of up to ``batch_size`` rows, so a history sync
+    flood costs one transaction per batch instead of one per message.
+
+    Texts are indexed in an FTS5 table kept in sync by triggers, so the
+    index is fed by the same batched writes and :meth:`search` never scans.
+
+    With ``retention``, :meth:`start` prunes messages older than that many
+    seconds once a day.
+    """
+
+    _schema = """
+        CREATE TABLE IF NOT EXISTS messages (
+            chat TEXT NOT NULL,
+            id TEXT NOT NULL,
+            sender TEXT NOT NULL,
+            timestamp INTEGER NOT NULL,
+            from_me INTEGER NOT NULL,
+            msg_type TEXT NOT NULL,
+            text TEXT NOT NULL,
+            PRIMARY KEY (chat, id)
+        );
+        CREATE INDEX IF NOT EXISTS messages_chat_time ON messages (chat, timestamp);
+    """
+    _fts_schema = """
+        CREATE VIRTUAL TABLE messages_fts USING fts5 (
+            text, content='messages', tokenize='unicode61 remove_diacritics 2'
+        );
+        CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages
+        WHEN new.text != '' BEGIN
+            INSERT INTO messages_fts (rowid, text) VALUES (new.rowid, new.text);
+        END;
+        CREATE TRIGGER messages_fts_delete AFTER DELETE ON messages
+        WHEN old.text != '' BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, text)
+            VALUES ('delete', old.rowid, old.text);
+        END;
+        INSERT INTO messages_fts (messages_fts) VALUES ('rebuild');
+    """
+
+    # rows deleted per transaction by prune, so the writer is never held long
+    prune_batch = 5000
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        retention: float = 0,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention = retention
+        self.written = 0
+        self._job: Optional["Job"] = None
+        self._queue: "queue.Queue[Optional[StoredMessage]]" = queue.Queue()
+        self._readers = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self.connect() as conn:
+            conn.executescript(self._schema)
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'"
+            ).fetchone()
+            if not exists:
+                # also indexes what a store without the index already holds
+                conn.executescript(self._fts_schema)
+        self._thread = threading.Thread(
+            target=self._writer, name="message-store", daemon=True
+        )
+        self._thread.start()
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def add(self, message: StoredMessage) -> None:
+        self._queue.put(message)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _writer(self) -> None:
+        conn = self.connect()
+        running = True
+        while running:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch: List[StoredMessage] = []
+            item: Optional[StoredMessage] = first
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            else:
+                running = False
+            if batch:
+                self._write(conn, batch)
+        conn.close()
+
+    def _write(self, conn: sqlite3.Connection, batch: List[StoredMessage]) -> None:
+        start = time.perf_counter()
+        try:
+            with conn:
+                cursor = conn.executemany(
+                    "INSERT OR IGNORE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    batch,
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Failed to store {len(batch)} messages: {e}")
+            return
+        # duplicates are ignored, e.g. a history chunk sent again
+        self.written += cursor.rowcount
+        logger.debug(
+            f"Stored {len(batch)} messages in {(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = self._readers.conn = self.connect()
+        return conn
+
+    def search(
+        self,
+        text: str,
+        chat: Optional[str] = None,
+        sender: Optional[str] = None,
+        msg_type: Union[str, Sequence[str], None] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        limit: int = 10,
+        offset: int = 0,
+    ) -> SearchPage:
+        """
+        Messages containing every word of ``text`` (as prefixes), best match
+        first, optionally filtered by chat, sender, type (one or any of several)
+        and a timestamp range.
+        """
+        where = ["messages_fts MATCH ?"]
+        params: list = [fts_query(text)]
+        if msg_type is not None and not isinstance(msg_type, str):
+            where.append(f"m.msg_type IN ({', '.join('?' * len(msg_type))})")
+            params.extend(msg_type)
+            msg_type = None
+        for column, value in (
+            ("m.chat = ?", chat),
+            ("m.sender = ?", sender),
+            ("m.msg_type = ?", msg_type),
+            ("m.timestamp >= ?", since),
+            ("m.timestamp < ?", until),
+        ):
+            if value is not None:
+                where.append(column)
+                params.append(value)
+        if not params[0]:
+            return SearchPage([], 0, offset, limit)
+        # CROSS JOIN keeps the FTS match as the outer loop, a plain JOIN lets
+        # the planner walk the chat index and run the match once per row
+        joined = (
+            "FROM messages_fts CROSS JOIN messages m ON m.rowid = messages_fts.rowid "
+            f"WHERE {' AND '.join(where)}"
+        )
+        conn = self._reader()
+        try:
+            total = conn.execute(f"SELECT COUNT(*) {joined}", params).fetchone()[0]
+            rows = conn.execute(
+                "SELECT m.chat, m.id, m.sender, m.timestamp, m.msg_type, m.text, "
+                "snippet(messages_fts, 0, '*', '*', '…', 12), bm25(messages_fts) "
+                f"{joined} ORDER BY bm25(messages_fts), m.timestamp DESC "
+                "LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Search for {text!r} failed: {e}")
+            return SearchPage([], 0, offset, limit)
+        return SearchPage([SearchResult(*row) for row in rows], total, offset, limit)
+
+    def prune(self, max_age: Optional[float] = None) -> int:
+        """Deletes messages older than ``max_age`` seconds, returns how many."""
+        max_age = self.retention if max_age is None else max_age
+        if max_age <= 0:
+            return 0
+        before = int(time.time() - max_age)
+        deleted = 0
+        conn = self.connect()
+        try:
+            while True:
+                with conn:
+                    cursor = conn.execute(
+                        "DELETE FROM messages WHERE rowid IN ("
+                        "SELECT rowid FROM messages WHERE timestamp < ? LIMIT ?)",
+                        (before, self.prune_batch),
+                    )
+                deleted += cursor.rowcount
+                if cursor.rowcount < self.prune_batch:
+                    break
+        except sqlite3.Error as e:
+            logger.error(f"Failed to prune messages from {self.path}: {e}")
+        finally:
+            conn.close()
+        if deleted:
+            logger.info(f"Pruned {deleted} stored messages older than {max_age:g}s")
+        return deleted
+
+    def start(self, scheduler: "Scheduler") -> None:
+        if self.retention <= 0 or self._job is not None:
+            return
+        self._job = scheduler.every(
+            60 * 60 * 24, self.prune, name="prune_messages", jitter=600, first_delay=60
+        )
+
+    def close(self, timeout: float = 5) -> None:
+        """Writes what is queued and stops the writer."""
+        if self._job is not None:
+            self._job.cancel()
+        self._queue.put(None)
+        self._thread.join(timeout)
@@ -0,0 +1,288 @@
+import logging
+import multiprocessing
+import os
+import pathlib
+import queue
+import signal
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from luna.command import discover_commands
+from luna.metrics import MetricFamily, Sample, metrics, render, start_http_server
+from luna.utils import logger
+
+if TYPE_CHECKING:
+    from multiprocessing.context import BaseContext
+    from multiprocessing.process import BaseProcess
+    from multiprocessing.synchronize import Event
+
+    from luna.core import Runner
+
+# Modules the fork server imports once for every session. Anything that
+# imports neonize loads the Go runtime, which does not survive a fork.
+PRELOAD = [
+    "luna",
+    "luna.config",
+    "luna.command",
+    "luna.ingress",
+    "luna.metrics",
+    "luna.middleware",
+    "luna.profiler",
+    "luna.recorder",
+    "luna.snapshot",
+    "luna.tracing",
+]
+
+
+def process_context() -> "BaseContext":
+    """A fork server context that preloads :data:`PRELOAD`, spawn where unsupported."""
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    ctx = multiprocessing.get_context("forkserver")
+    ctx.set_forkserver_preload(PRELOAD)
+    return ctx
+
+
+SESSION_RESTARTS = metrics.counter(
+    "luna_session_restarts_total",
+    "Number of times a session was restarted",
+    ["session"],
+)
+
+
+def _exit_on(shutdown: "Event", runner: "Runner") -> None:
+    """Closes ``runner`` once ``shutdown`` is set, then exits the process."""
+    shutdown.wait()
+    # the main thread is blocked in neonize's connect(), where Python signal
+    # handlers never run, so the snapshot save, quota flush and message store
+    # close are run from this thread
+    try:
+        runner.close()
+    finally:
+        os._exit(0)
+
+
+def _wake_on(fd: int, shutdown: threading.Event) -> None:
+    os.read(fd, 1)
+    shutdown.set()
+
+
+def exit_on_signal(runner: "Runner") -> None:
+    """
+    Closes ``runner`` and exits on SIGTERM or SIGINT when it runs without a
+    supervisor. Must be called from the main thread, before :meth:`Runner.run`.
+
+    The handlers themselves only run once connect() returns, but the C level
+    handler writes to the wakeup fd right away, which a thread waits on.
+    """
+    shutdown = threading.Event()
+    read, write = os.pipe()
+    os.set_blocking(write, False)
+    signal.set_wakeup_fd(write)
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: shutdown.set())
+    threading.Thread(
+        target=_wake_on, args=(read, shutdown), name="signal", daemon=True
+    ).start()
+    threading.Thread(
+        target=_exit_on, args=(shutdown, runner), name="shutdown", daemon=True
+    ).start()
+
+
+def _run_session(
+    name: str,
+    dir_commands: str,
+    manifest: List[str],
+    metrics_queue,
+    push_interval: float,
+    shutdown: "Event",
+):
+    """Entry point of a session process."""
+    from neonize.utils import log
+
+    from luna.core import Runner
+
+    log.setLevel(logging.CRITICAL)
+    logger.set_prefix(name)
+
+    runner = Runner(name, dir_commands=dir_commands, manifest=manifest)
+    threading.Thread(
+        target=_exit_on, args=(shutdown, runner), name="shutdown", daemon=True
+    ).start()
+
+    def push():
+        metrics_queue.put((name, metrics.collect()))
+
+    runner.scheduler.every(push_interval, push, name="metrics_push")
+    runner.run(serve_metrics=False)
+
+
+@dataclass
+class Session:
+    name: str
+    process: Optional["BaseProcess"] = None
+    # set to ask the process to run its exit hooks and stop
+    shutdown: Optional["Event"] = None
+    started_at: float = 0.0
+    failures: int = 0
+    restart_at: float = 0.0
+
+    @property
+    def up(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+
+def merge(
+    families: List[MetricFamily], sessions: Dict[str, List[MetricFamily]]
+) -> List[MetricFamily]:
+    """Merges the families pushed by the sessions, labelling them by ``session``."""
+    merged: Dict[str, MetricFamily] = {
+        family.name: MetricFamily(
+            family.name, family.type, family.help, list(family.samples)
+        )
+        for family in families
+    }
+    for session, session_families in sessions.items():
+        for family in session_families:
+            target = merged.get(family.name)
+            if target is None:
+                target = merged[family.name] = MetricFamily(
+                    family.name, family.type, family.help, []
+                )
+            target.samples.extend(
+                Sample(sample.name, {"session": session, **sample.labels}, sample.value)
+                for sample in family.samples
+            )
+    return list(merged.values())
+
+
+class Supervisor:
+    """
+    Runs one :class:`~luna.core.Runner` per session name in its own process,
+    restarting crashed sessions with exponential backoff.
+
+    The command directory is walked once and the resulting manifest is
+    handed to every session. Sessions push their metrics here every
+    ``push_interval`` seconds and are served together on one endpoint.
+    """
+
+    def __init__(
+        self,
+        names: List[str],
+        dir_commands: str = "commands",
+        backoff_base: float = 1.0,
+        backoff_max: float = 300.0,
+        stable_after: float = 60.0,
+        push_interval: float = 5.0,
+    ):
+        self.sessions = {name: Session(name) for name in names}
+        self.dir_commands = dir_commands
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stable_after = stable_after
+        self.push_interval = push_interval
+        self.manifest = [
+            path.as_posix() for path in discover_commands(pathlib.Path(dir_commands))
+        ]
+        self._ctx = process_context()
+        self._queue = self._ctx.Queue()
+        self._session_metrics: Dict[str, List[MetricFamily]] = {}
+        self._stop = threading.Event()
+        metrics.gauge(
+            "luna_session_up",
+            "Whether a session process is running",
+            lambda: {(s.name,): int(s.up) for s in self.sessions.values()},
+            ["session"],
+        )
+
+    def start_session(self, session: Session) -> None:
+        session.shutdown = self._ctx.Event()
+        session.process = self._ctx.Process(
+            target=_run_session,
+            args=(
+                session.name,
+                self.dir_commands,
+                self.manifest,
+                self._queue,
+                self.push_interval,
+                session.shutdown,
+            ),
+            name=f"luna-{session.name}",
+        )
+        session.process.start()
+        session.started_at = time.monotonic()
+        logger.info(f"Started session {session.name} (pid {session.process.pid})")
+
+    def _check(self, session: Session) -> None:
+        now = time.monotonic()
+        if session.process is None:
+            if now >= session.restart_at:
+                self.start_session(session)
+            return
+        if session.process.is_alive():
+            return
+
+        exitcode = session.process.exitcode
+        session.process = None
+        if now - session.started_at >= self.stable_after:
+            session.failures = 0
+        session.failures += 1
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (session.failures - 1))
+        session.restart_at = now + delay
+        SESSION_RESTARTS.inc(session=session.name)
+        logger.error(
+            f"Session {session.name} exited with code {exitcode}, "
+            f"restarting in {delay:.0f}s"
+        )
+
+    def _collect(self) -> None:
+        while not self._stop.is_set():
+            try:
+                name, families = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            self._session_metrics[name] = families
+
+    def render(self) -> str:
+        return render(merge(metrics.collect(), dict(self._session_metrics)))
+
+    def run(self, metrics_port: int = 0, metrics_addr: str = "127.0.0.1") -> None:
+        if metrics_port:
+            start_http_server(metrics_port, metrics_addr, collect=self.render)
+        threading.Thread(
+            target=self._collect, name="metrics-collect", daemon=True
+        ).start()
+        logger.info(
+            f"Supervising {len(self.sessions)} sessions "
+            f"with {len(self.manifest)} command modules"
+        )
+        if threading.current_thread() is threading.main_thread():
+            # docker stop and kill send SIGTERM, the sessions still get to close
+            signal.signal(signal.SIGTERM, lambda *_: self._stop.set())
+        try:
+            while not self._stop.wait(1):
+                for session in self.sessions.values():
+                    self._check(session)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Asks every session to run its exit hooks, kills those up after ``timeout``."""
+        self._stop.set()
+        sessions = [s for s in self.sessions.values() if s.process is not None]
+        for session in sessions:
+            if session.shutdown is not None:
+                session.shutdown.set()
+        processes = [s.process for s in sessions]
+        deadline = time.monotonic() + timeout
+        for process in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warn(f"Killing {process.name}, it did not exit in time")
+                process.kill()
@@ -0,0 +1,124 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from luna.utils import logger
+
+T = TypeVar("T")
+
+
+@dataclass
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    start: float
+    duration: float = 0.0
+    thread: str = ""
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+class SpanExporter:
+    def export(self, span: Span) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class JsonLinesExporter(SpanExporter):
+    """Appends one JSON object per finished span to ``path``."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", buffering=1, encoding="utf-8")
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(asdict(span), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "luna_span", default=None
+)
+
+
+class Tracer:
+    """
+    Lightweight span tracer, a no-op until an exporter is set.
+
+    The current span lives in a context variable, use :meth:`wrap` (or run
+    the job in a copied context) to carry it into another thread.
+    """
+
+    def __init__(self, exporter: Optional[SpanExporter] = None):
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def set_exporter(self, exporter: Optional[SpanExporter]) -> None:
+        if self.exporter is not None:
+            self.exporter.close()
+        self.exporter = exporter
+
+    @contextmanager
+    def span(self, name: str, trace_id: Optional[str] = None, **attributes: Any):
+        exporter = self.exporter
+        if exporter is None:
+            yield None
+            return
+
+        parent = _current_span.get()
+        if trace_id is None:
+            trace_id = parent.trace_id if parent else os.urandom(8).hex()
+        span = Span(
+            trace_id=trace_id,
+            span_id=os.urandom(8).hex(),
+            parent_id=parent.span_id if parent and parent.trace_id == trace_id else None,
+            name=name,
+            start=time.time(),
+            thread=threading.current_thread().name,
+            attributes=attributes,
+        )
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            _current_span.reset(token)
+            try:
+                exporter.export(span)
+            except Exception as e:
+                logger.error(f"Failed to export span {name}: {e}")
+
+    def wrap(self, func: Callable[..., T]) -> Callable[..., T]:
+        """Binds ``func`` to the current span so spans follow it across threads."""
+        parent = _current_span.get()
+
+        def wrapper(*args, **kwargs) -> T:
+            # a fresh context per call, one Context cannot be entered twice at once
+            context = contextvars.copy_context()
+            context.run(_current_span.set, parent)
+            return context.run(func, *args, **kwargs)
+
+        return wrapper
+
+
+tracer = Tracer()
@@ -1,11 +1,32 @@
-from .common import get_repr, jid_to_str, str_to_jid
-from .serializer import GroupSerialize, MessageSerialize, QuotedSerialize
+from typing import TYPE_CHECKING
+
 from .logger import logger
-from .iofile import save_to_file
-from .messageprint import MessagePrint
+
+if TYPE_CHECKING:
+    from .common import get_repr, jid_to_str, str_to_jid
+    from .iofile import save_to_file
+    from .messageprint import MessagePrint
+    from .serializer import GroupSerialize, MessageSerialize, QuotedSerialize, get_text
+    from .template import MessageTemplate
+
+# Imported on first access, most of these pull in neonize or other heavy
+# dependencies.
+_LAZY = {
+    "get_repr": ".common",
+    "jid_to_str": ".common",
+    "str_to_jid": ".common",
+    "GroupSerialize": ".serializer",
+    "MessageSerialize": ".serializer",
+    "QuotedSerialize": ".serializer",
+    "get_text": ".serializer",
+    "save_to_file": ".iofile",
+    "MessagePrint": ".messageprint",
+    "MessageTemplate": ".template",
+}
 
 __all__ = [
     "MessagePrint",
+    "MessageTemplate",
     "save_to_file",
     "jid_to_str",
     "str_to_jid",
@@ -13,5 +34,16 @@ __all__ = [
     "MessageSerialize",
     "GroupSerialize",
     "QuotedSerialize",
+    "get_text",
     "logger",
 ]
+
+
+def __getattr__(name: str):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+
+    value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
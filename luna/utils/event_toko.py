@@ -1,7 +1,71 @@
-from typing import Callable, Any, Dict, List
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
 
 from luna.utils import logger
 
+_shared_executor: Optional[ThreadPoolExecutor] = None
+_shared_executor_lock = threading.Lock()
+
+
+def get_shared_executor() -> ThreadPoolExecutor:
+    """Returns the executor shared by every EventEmitter, creating it on first use."""
+    global _shared_executor
+    if _shared_executor is None:
+        with _shared_executor_lock:
+            if _shared_executor is None:
+                _shared_executor = ThreadPoolExecutor(thread_name_prefix="event_toko")
+    return _shared_executor
+
+
+@dataclass
+class ListenerStats:
+    calls: int = 0
+    errors: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+
+    @property
+    def avg_time(self) -> float:
+        return self.total_time / self.calls if self.calls else 0.0
+
+
+class _OrderedQueue:
+    """Runs the jobs of one event name one after another on the executor."""
+
+    def __init__(self, executor: Executor):
+        self._executor = executor
+        self._jobs: Deque[Tuple[Callable[[], Any], Future]] = deque()
+        self._lock = threading.Lock()
+        self._running = False
+
+    def submit(self, job: Callable[[], Any]) -> Future:
+        future: Future = Future()
+        with self._lock:
+            self._jobs.append((job, future))
+            if self._running:
+                return future
+            self._running = True
+        self._executor.submit(self._drain)
+        return future
+
+    def _drain(self) -> None:
+        while True:
+            with self._lock:
+                if not self._jobs:
+                    self._running = False
+                    return
+                job, future = self._jobs.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(job())
+            except BaseException as e:
+                future.set_exception(e)
+
 
 class EventEmitter:
     """
@@ -10,9 +74,11 @@ class EventEmitter:
     Provides methods for:
     - Registering event listeners with decorators (@events.on)
     - Manually registering listeners using the on() method
-    - Emitting events with optional arguments
+    - Emitting events with optional arguments, synchronously or on an executor
     - Removing event listeners
 
+    Listener lists are copy-on-write, so emitting never takes a lock.
+
     Examples:
     ```python
     from your_events import events
@@ -30,34 +96,119 @@ class EventEmitter:
 
     emitter.emit("trx", 1, 2, data="some value")  # Triggers handle_transaction
     emitter.emit("other_event", 1, 2, data="some value")  # Triggers logger_event
+
+    # Run the listeners on the shared executor, in emit order for "trx"
+    emitter.emit_async("trx", 1, 2, data="some value", ordered=True)
     ```
     """
 
-    def __init__(self):
-        self._listeners: Dict[str, List[Callable[..., Any]]] = {}
+    def __init__(self, executor: Optional[Executor] = None):
+        self._listeners: Dict[str, Tuple[Callable[..., Any], ...]] = {}
+        self._lock = threading.Lock()
+        self._executor = executor
+        self._ordered: Dict[str, _OrderedQueue] = {}
+        self._stats: Dict[Tuple[str, Callable[..., Any]], ListenerStats] = {}
+
+    @property
+    def executor(self) -> Executor:
+        return self._executor or get_shared_executor()
 
     def on(self, event_name: str) -> Callable[..., Any]:
         def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
             logger.info("Registering an event for %s" % event_name)
-            if event_name not in self._listeners:
-                self._listeners[event_name] = []
-            self._listeners[event_name].append(func)
+            with self._lock:
+                listeners = self._listeners.get(event_name, ())
+                self._listeners[event_name] = listeners + (func,)
+                self._stats.setdefault((event_name, func), ListenerStats())
             return func
 
         return decorator
 
-    def emit(self, event_name: str, *args) -> None:
+    def emit(self, event_name: str, *args, **kwargs) -> None:
+        """
+        Emits an event with optional arguments on the caller's thread.
+
+        Args:
+            event_name: The name of the event to emit.
+            *args: Positional arguments to pass to the listeners.
+            **kwargs: Keyword arguments to pass to the listeners.
+        """
+        for callback in self._listeners.get(event_name, ()):
+            self._call(event_name, callback, args, kwargs)
+
+    def emit_async(
+        self, event_name: str, *args, ordered: bool = False, **kwargs
+    ) -> List[Future]:
         """
-        Emits an event with optional arguments.
+        Emits an event without blocking the caller.
 
         Args:
             event_name: The name of the event to emit.
             *args: Positional arguments to pass to the listeners.
+            ordered: Deliver the events of this name one at a time, in emit order.
             **kwargs: Keyword arguments to pass to the listeners.
+
+        Returns:
+            One future per listener.
+        """
+        listeners = self._listeners.get(event_name, ())
+        if not listeners:
+            return []
+
+        if ordered:
+            queue = self._ordered.get(event_name)
+            if queue is None:
+                with self._lock:
+                    queue = self._ordered.setdefault(
+                        event_name, _OrderedQueue(self.executor)
+                    )
+            submit = queue.submit
+        else:
+            submit = self.executor.submit
+
+        return [
+            submit(self._safe_call_job(event_name, callback, args, kwargs))
+            for callback in listeners
+        ]
+
+    def _call(self, event_name: str, callback, args, kwargs) -> Any:
+        stats = self._stats.get((event_name, callback))
+        start = time.perf_counter()
+        try:
+            return callback(*args, **kwargs)
+        except Exception:
+            if stats is not None:
+                stats.errors += 1
+            raise
+        finally:
+            if stats is not None:
+                elapsed = time.perf_counter() - start
+                stats.calls += 1
+                stats.total_time += elapsed
+                if elapsed > stats.max_time:
+                    stats.max_time = elapsed
+
+    def _safe_call_job(self, event_name: str, callback, args, kwargs):
+        def job():
+            try:
+                return self._call(event_name, callback, args, kwargs)
+            except Exception as e:
+                logger.error(f"Listener {callback.__name__} for {event_name} failed: {e}")
+                raise
+
+        return job
+
+    def stats(self) -> Dict[str, Dict[str, ListenerStats]]:
         """
-        if event_name in self._listeners:
-            for callback in self._listeners[event_name]:
-                callback(*args)
+        Returns the timing stats of every listener, keyed by event name and
+        listener name. Counters are updated without locking and may be
+        slightly off under heavy concurrency.
+        """
+        result: Dict[str, Dict[str, ListenerStats]] = {}
+        for (event_name, callback), stats in list(self._stats.items()):
+            name = getattr(callback, "__qualname__", repr(callback))
+            result.setdefault(event_name, {})[name] = stats
+        return result
 
     def remove_listener(self, event_name: str, callback) -> None:
         """
@@ -67,8 +218,11 @@ class EventEmitter:
             event_name: The name of the event to remove the listener from.
             callback: The function to remove.
         """
-        if event_name in self._listeners:
-            try:
-                self._listeners[event_name].remove(callback)
-            except ValueError:
-                pass  # Silently handle if the callback is not found
+        with self._lock:
+            listeners = self._listeners.get(event_name)
+            if not listeners or callback not in listeners:
+                return  # Silently handle if the callback is not found
+            index = listeners.index(callback)
+            self._listeners[event_name] = listeners[:index] + listeners[index + 1 :]
+            if callback not in self._listeners[event_name]:
+                self._stats.pop((event_name, callback), None)
@@ -11,11 +11,20 @@ class Logger:
         "UNDERLINE": "\033[4m",
     }
 
+    # set to the session name when several bots share one terminal
+    prefix = ""
+
+    @staticmethod
+    def set_prefix(prefix: str):
+        Logger.prefix = prefix
+
     @staticmethod
     def log(level, *args):
         text_color = "\033[91m" if level.upper() == "CRITICAL" else "\033[37m"
         level_color = Logger.COLORS.get(level.upper(), "")
         endc = Logger.COLORS["ENDC"]
+        if Logger.prefix:
+            args = (f"[{Logger.prefix}]", *args)
         print(f"[{level_color}{level.upper()}{endc}]", text_color, *args, endc)
 
     @staticmethod
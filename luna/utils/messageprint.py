@@ -1,8 +1,19 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
 from termcolor import colored
-import difflib
+from luna.metrics import metrics
+from luna.utils.textdiff import word_diff
 from luna.wa_classes import Message
 from neonize.proto import def_pb2 as wa_proto
-import phonenumbers as pn
+
+# runner.chats holds every printed message, counted here so reading its size
+# does not walk the store
+CHAT_STORE_MESSAGES = metrics.counter(
+    "luna_chat_store_messages_total", "Messages added to runner.chats"
+)
 
 
 def _get_text(msg: wa_proto.Message) -> str:
@@ -18,23 +29,64 @@ def _get_text(msg: wa_proto.Message) -> str:
     return ""
 
 
+# edits with more words than this are rendered on a background thread
+INLINE_DIFF_TOKENS = 300
+# unchanged words kept around each change, longer runs are elided
+DIFF_CONTEXT = 5
+
+# (edited message id, edit message id) -> rendered diff
+_diff_cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+_diff_cache_lock = threading.Lock()
+_diff_executor = ThreadPoolExecutor(1, thread_name_prefix="edit-diff")
+
+
+def _elide(words: List[str], first: bool, last: bool) -> str:
+    keep_head = 0 if first else DIFF_CONTEXT
+    keep_tail = 0 if last else DIFF_CONTEXT
+    if len(words) <= keep_head + keep_tail + 1:
+        return " ".join(words)
+    head = words[:keep_head]
+    tail = words[len(words) - keep_tail :] if keep_tail else []
+    return " ".join(head + [colored("…", "grey")] + tail)
+
+
 def color_diff(text_before: str, text_after: str) -> str:
-    diff = difflib.ndiff(text_before.split(), text_after.split())
+    ops = word_diff(text_before, text_after)
+    if ops is None:
+        # too big to diff at a bounded cost, summarize instead
+        before, after = len(text_before.split()), len(text_after.split())
+        preview = text_after if len(text_after) <= 200 else text_after[:200] + "…"
+        return (
+            f"{colored(f'[diff dilewati: {before} -> {after} kata]', 'grey')} {preview}"
+        )
 
     result = []
-    for d in diff:
-        if d[0] == "-":
+    for i, (tag, words) in enumerate(ops):
+        if tag == "-":
             # Words that are in text_before but not in text_after will be colored red
-            result.append(colored(d, "red"))
-        elif d[0] == "+":
+            result.append(colored(f"- {' '.join(words)}", "red"))
+        elif tag == "+":
             # Words that are in text_after but not in text_before will be colored green
-            result.append(colored(d, "green"))
+            result.append(colored(f"+ {' '.join(words)}", "green"))
         else:
-            result.append(d)
+            result.append(_elide(words, i == 0, i == len(ops) - 1))
 
     return " ".join(result)
 
 
+def cached_color_diff(key: Tuple[str, str], text_before: str, text_after: str) -> str:
+    with _diff_cache_lock:
+        if key in _diff_cache:
+            _diff_cache.move_to_end(key)
+            return _diff_cache[key]
+    text = color_diff(text_before, text_after)
+    with _diff_cache_lock:
+        _diff_cache[key] = text
+        if len(_diff_cache) > 256:
+            _diff_cache.popitem(last=False)
+    return text
+
+
 class MessagePrint:
     SQUARE_BRACKET = f"{colored('[', 'white')}%value{colored(']', 'white')}"
 
@@ -42,8 +94,35 @@ class MessagePrint:
         self.msg = msg
 
     def __call__(self) -> None:
-        self.msg.runner.chats.setdefault(self.msg.chat, {})
-        self.msg.runner.chats[self.msg.chat][self.msg.id] = self.msg
+        chat_store = self.msg.runner.chats.setdefault(self.msg.chat, {})
+        if self.msg.id not in chat_store:
+            CHAT_STORE_MESSAGES.inc()
+        chat_store[self.msg.id] = self.msg
+        if self._is_large_edit():
+            # printed a bit later, in order with the other large edits
+            _diff_executor.submit(self._print)
+            return
+        self._print()
+
+    def _edited(self) -> Tuple[Optional[Message], "wa_proto.ProtocolMessage"]:
+        protocol_msg = self.msg._message.Message.protocolMessage
+        if protocol_msg.type != wa_proto.ProtocolMessage.MESSAGE_EDIT:
+            return None, protocol_msg
+        chat_store = self.msg.runner.chats.get(self.msg.chat, {})
+        return chat_store.get(protocol_msg.key.id, None), protocol_msg
+
+    def _is_large_edit(self) -> bool:
+        if self.msg.msg_type != "protocolMessage":
+            return False
+        msg_edited, protocol_msg = self._edited()
+        if msg_edited is None:
+            return False
+        words = msg_edited.text.count(" ") + _get_text(
+            protocol_msg.editedMessage
+        ).count(" ")
+        return words > INLINE_DIFF_TOKENS
+
+    def _print(self) -> None:
         msg = self.msg
         tag = colored("SENT", "cyan") if msg.is_bot else colored("RECV", "green")
         recv_type = (
@@ -61,13 +140,13 @@ class MessagePrint:
             protocol_type = wa_proto.ProtocolMessage.Type.Name(protocol_msg.type)
             match protocol_type:
                 case "MESSAGE_EDIT":
-                    msg_edited: Message = msg.runner.chats[msg.chat].get(
-                        protocol_msg.key.id, None
-                    )
+                    msg_edited, _ = self._edited()
                     if msg_edited:
                         text_before = msg_edited.text
                         text_after = _get_text(protocol_msg.editedMessage)
-                        text = color_diff(text_before, text_after)
+                        text = cached_color_diff(
+                            (protocol_msg.key.id, msg.id), text_before, text_after
+                        )
 
             msg_type = colored(f"{protocol_type}", "blue")
         msg_type = self.SQUARE_BRACKET.replace("%value", msg_type)
@@ -76,6 +155,8 @@ class MessagePrint:
         if group_metadata := msg.group_metadata():
             group_name = group_metadata.subject.name
 
+        import phonenumbers as pn
+
         sender = pn.parse("+" + msg.sender.split("@")[0])
         sender = pn.format_number(sender, pn.PhoneNumberFormat.INTERNATIONAL)
         chat = f"{group_name}" if msg.is_group else f"{sender}"
@@ -10,7 +10,7 @@ from luna.wa_classes import (
     Message,
     QuotedMessage,
 )
-from luna.utils import jid_to_str, str_to_jid
+from luna.utils import jid_to_str
 
 if TYPE_CHECKING:
     from neonize.events import MessageEv
@@ -28,7 +28,8 @@ if TYPE_CHECKING:
     from luna.core import Runner
 
 
-def _get_text(msg: wa_proto.Message) -> str:
+def get_text(msg: wa_proto.Message) -> str:
+    """The text, caption or name of the message's first field, empty if none."""
     msg_fields = msg.ListFields()
     if msg_fields:
         _, field_value = msg_fields[0]
@@ -79,7 +80,7 @@ class QuotedSerialize:
     @property
     def _text(self) -> str:
         msg = self._raw_message.quotedMessage
-        return _get_text(msg)
+        return get_text(msg)
 
     @property
     def _is_bot(self) -> bool:
@@ -240,7 +241,7 @@ class MessageSerialize:
 
     @property
     def _push_name(self) -> str:
-        _sender_contact = self._runner.contact.get_contact(str_to_jid(self._sender))
+        _sender_contact = self._runner.get_contact(self._sender)
         if _sender_contact.Found:
             return _sender_contact.PushName
         return ""
@@ -316,7 +317,7 @@ class MessageSerialize:
     @property
     def _text(self) -> str:
         msg = self._message.Message
-        return _get_text(msg)
+        return get_text(msg)
 
     @property
     def _id(self) -> str:
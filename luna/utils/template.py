@@ -0,0 +1,43 @@
+from typing import TYPE_CHECKING, Optional
+
+from neonize.proto import def_pb2 as wa_proto
+
+if TYPE_CHECKING:
+    from neonize.proto.def_pb2 import ContextInfo
+
+
+class MessageTemplate:
+    """
+    A prebuilt message body that can be sent many times.
+
+    The message is serialized once when the template is created and its
+    message type is resolved once, so sending only has to parse the cached
+    bytes and patch in the quoted context.
+    """
+
+    __slots__ = ("msg_type", "_payload", "_text")
+
+    def __init__(self, message: wa_proto.Message, msg_type: str) -> None:
+        self.msg_type = msg_type
+        self._payload = message.SerializeToString()
+        # a plain conversation has no contextInfo, quoting it needs an
+        # extendedTextMessage instead
+        self._text = message.conversation if msg_type == "conversation" else None
+
+    def build(self, context_info: Optional["ContextInfo"] = None) -> wa_proto.Message:
+        if context_info is None:
+            return wa_proto.Message.FromString(self._payload)
+
+        if self._text is not None:
+            return wa_proto.Message(
+                extendedTextMessage=wa_proto.ExtendedTextMessage(
+                    text=self._text, contextInfo=context_info
+                )
+            )
+
+        message = wa_proto.Message.FromString(self._payload)
+        getattr(message, self.msg_type).contextInfo.MergeFrom(context_info)
+        return message
+
+    def __repr__(self) -> str:
+        return f"MessageTemplate(msg_type={self.msg_type!r}, size={len(self._payload)})"
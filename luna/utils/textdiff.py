@@ -0,0 +1,100 @@
+from typing import List, Optional, Sequence, Tuple
+
+# (tag, tokens) with tag one of "=", "-", "+"
+Opcode = Tuple[str, List[str]]
+
+
+def _myers(a: Sequence[str], b: Sequence[str], max_d: int) -> Optional[List[Opcode]]:
+    """
+    Myers' O((N+M)D) shortest edit script, or None when more than ``max_d``
+    tokens differ so the cost stays bounded whatever the input.
+    """
+    n, m = len(a), len(b)
+    offset = max_d + 1
+    v = [0] * (2 * offset + 1)
+    trace = []
+    for d in range(max_d + 1):
+        trace.append(v[:])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]  # insertion
+            else:
+                x = v[offset + k - 1] + 1  # deletion
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                return _backtrack(a, b, trace, offset, d)
+    return None
+
+
+def _backtrack(
+    a: Sequence[str], b: Sequence[str], trace: List[List[int]], offset: int, d: int
+) -> List[Opcode]:
+    ops: List[Tuple[str, str]] = []
+    x, y = len(a), len(b)
+    for depth in range(d, 0, -1):
+        v = trace[depth]
+        k = x - y
+        if k == -depth or (k != depth and v[offset + k - 1] < v[offset + k + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[offset + prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            ops.append(("=", a[x]))
+        if x == prev_x:
+            y -= 1
+            ops.append(("+", b[y]))
+        else:
+            x -= 1
+            ops.append(("-", a[x]))
+    while x > 0:
+        x -= 1
+        ops.append(("=", a[x]))
+    ops.reverse()
+
+    grouped: List[Opcode] = []
+    for tag, token in ops:
+        if grouped and grouped[-1][0] == tag:
+            grouped[-1][1].append(token)
+        else:
+            grouped.append((tag, [token]))
+    return grouped
+
+
+def word_diff(
+    before: str, after: str, max_tokens: int = 5000, max_d: int = 100
+) -> Optional[List[Opcode]]:
+    """
+    Word level diff of ``before`` and ``after``.
+
+    The common prefix and suffix are split off first, so the usual edit of a
+    few words in a long text costs O(N). Returns None when the texts have
+    more than ``max_tokens`` words or more than ``max_d`` words changed.
+    """
+    a, b = before.split(), after.split()
+    if len(a) + len(b) > max_tokens:
+        return None
+    start = 0
+    end = min(len(a), len(b))
+    while start < end and a[start] == b[start]:
+        start += 1
+    tail = 0
+    while tail < end - start and a[-1 - tail] == b[-1 - tail]:
+        tail += 1
+    middle = _myers(a[start : len(a) - tail], b[start : len(b) - tail], max_d)
+    if middle is None:
+        return None
+    ops: List[Opcode] = []
+    if start:
+        ops.append(("=", a[:start]))
+    ops.extend(middle)
+    if tail:
+        ops.append(("=", a[len(a) - tail :]))
+    return ops
@@ -1,5 +1,12 @@
 from .client import UserInfo
-from .groups import GroupDesc, GroupMetadata, GroupParticipant, GroupSubject
+from .groups import (
+    BulkParticipantResult,
+    GroupDesc,
+    GroupMetadata,
+    GroupParticipant,
+    GroupSubject,
+    ParticipantResult,
+)
 from .messages import Message, QuotedMessage
 
 __all__ = [
@@ -8,6 +15,8 @@ __all__ = [
     "GroupParticipant",
     "GroupDesc",
     "GroupSubject",
+    "ParticipantResult",
+    "BulkParticipantResult",
     "QuotedMessage",
     "Message",
 ]
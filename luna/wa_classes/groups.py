@@ -65,3 +65,38 @@ class GroupMetadata:
 
     def __repr__(self) -> str:
         return get_repr(self)
+
+
+@dataclass
+class ParticipantResult:
+    """Outcome of a participant update for one member"""
+
+    jid: str
+    ok: bool
+    # status code from the server, e.g. 403 when an invite is required, -1 when
+    # the request for the whole chunk failed, -2 when the server response did
+    # not mention the member
+    error: int = 0
+    error_message: str = ""
+
+    def __repr__(self) -> str:
+        return get_repr(self)
+
+
+@dataclass
+class BulkParticipantResult:
+    """Aggregated outcome of a chunked participant update"""
+
+    action: str
+    results: List[ParticipantResult]
+
+    @property
+    def succeeded(self) -> List[str]:
+        return [r.jid for r in self.results if r.ok]
+
+    @property
+    def failed(self) -> List[ParticipantResult]:
+        return [r for r in self.results if not r.ok]
+
+    def __repr__(self) -> str:
+        return get_repr(self)
@@ -58,5 +58,9 @@ class Message:
     command: str = field(default="", init=True)
     used_prefix: str = field(default="", init=True)
 
+    def reply_file(self, file, caption: str = "", **kwargs):
+        """Sends ``file`` to this chat quoting this message, see ``Runner.send_file``."""
+        return self.runner.send_file(self.chat, file, caption, quoted=self, **kwargs)
+
     def __repr__(self) -> str:
         return get_repr(self)
@@ -1,35 +1,33 @@
 import logging
-import os
-import threading
-import time
-from neonize.utils import log
 
-from luna import Runner
-from luna.config import BOT_NAME, DIR_COMMANDS
+from luna.config import (
+    BOT_NAME,
+    BOT_SESSIONS,
+    DIR_COMMANDS,
+    METRICS_ADDR,
+    METRICS_PORT,
+)
 
-log.setLevel(logging.CRITICAL)
 
+def main():
+    # the tmp folder is cleared by each Runner's scheduler
+    if BOT_SESSIONS:
+        # neonize must not be imported here, see luna.supervisor.PRELOAD
+        from luna.supervisor import Supervisor
 
-# Intervally clear tmp folder
-def clear_tmp_folder():
-    while True:
-        time.sleep(60 * 60 * 24)  # 24 hours
-        for file in os.listdir("tmp"):
-            try:
-                os.remove(f"tmp/{file}")
-            except Exception as e:
-                print(e)
-
+        supervisor = Supervisor(BOT_SESSIONS, dir_commands=DIR_COMMANDS)
+        supervisor.run(METRICS_PORT, METRICS_ADDR)
+        return
 
-try:
-    clear_tmp_folder_thread = threading.Thread(target=clear_tmp_folder)
-    clear_tmp_folder_thread.start()
-except KeyboardInterrupt:
-    pass
+    from neonize.utils import log
 
+    from luna import Runner
+    from luna.supervisor import exit_on_signal
 
-def main():
+    log.setLevel(logging.CRITICAL)
     bot = Runner(BOT_NAME, dir_commands=DIR_COMMANDS)
+    # saves the snapshot and flushes the stores on SIGTERM, like a session does
+    exit_on_signal(bot)
     bot.run()
 
 